@@ -1,16 +1,22 @@
 import datetime
 import os
+import json
+import time
 import asyncio
+from contextlib import aclosing
 from typing import TypedDict, Optional, List, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
 
 # ✅ Correct Imports
 from app.core.database import conversations_collection, visual_memory_collection
-from app.core.personality import LUNA_SYSTEM_PROMPT
 from app.core.rag import luna_rag
+from app.core.llm_gateway import llm_gateway
+from app.core.intent_classifier import intent_classifier
+from app.core.summarizer import load_context, schedule_summary
+from app.core.prompt_builder import prompt_builder
 from app.core.photoengine import select_companion_photo 
 # Note: Ensure you have updated generation.py with build_enhanced_prompt function
 from app.routers.generation import build_enhanced_prompt
@@ -23,7 +29,9 @@ class AgentState(TypedDict):
     intent: str
     mood: str
     photo_subject: Optional[str]
-    context_summary: str
+    conversation_summary: str
+    memory_notes: List[str]
+    prompt_tokens: Optional[dict]
     chat_history: List[dict]
     final_response: str
     photo_url: Optional[str]
@@ -36,31 +44,56 @@ llm = ChatGoogleGenerativeAI(
     max_retries=3,
 )
 
+# Speculative mode: reply generation intent ke saath hi shuru ho jaata hai,
+# photo intent nikla to reply cancel. Plain chat turns pe ek LLM round-trip bachta hai.
+SPECULATIVE_REPLY = os.getenv("LUNA_SPECULATIVE_REPLY", "1") == "1"
+
+speculation_stats = {
+    "turns": 0,          # Kitne turns speculatively chale
+    "used": 0,           # Reply kaam aaya (intent = chat)
+    "wasted": 0,         # Reply cancel hua (intent = photo)
+    "saved_ms": 0.0,     # Intent call ka time jo reply ke saath overlap hua
+}
+
+def get_speculation_stats():
+    turns = speculation_stats["turns"]
+    return {
+        **speculation_stats,
+        "enabled": SPECULATIVE_REPLY,
+        "wasted_rate": round(speculation_stats["wasted"] / turns, 3) if turns else 0.0,
+        "avg_saved_ms": round(speculation_stats["saved_ms"] / speculation_stats["used"], 1) if speculation_stats["used"] else 0.0,
+    }
+
 # --- 3. DEFINE NODES ---
 
 async def node_retrieve_context(state: AgentState):
     print(f"--- 🧠 NODE: RETRIEVING CONTEXT FOR {state['user_id']} ---")
     user_id = state['user_id']
     
-    # Local DB returns a list directly
-    history_cursor = conversations_collection.find({"user_id": user_id}).sort("timestamp", 1).limit(10)
-    history_docs = list(history_cursor) 
+    # Running summary (purane turns) + last K turns, token budget ke andar
+    summary, history_docs = await load_context(user_id)
 
-    mem_cursor = visual_memory_collection.find({"user_id": user_id}).sort("timestamp", -1).limit(5)
-    memories = list(mem_cursor)
+    memories = await visual_memory_collection.find({"user_id": user_id}).sort("timestamp", -1).to_list(5)
 
-    context_str = ""
-    if memories:
-        context_str += "\n\n**Visual Memories:**\n"
-        for mem in memories:
-            desc = mem.get('description', 'unknown image')
-            context_str += f"- {desc}\n"
+    # Prompt builder budget ke hisaab se inme se jitna fit ho utna lega
+    notes = [mem.get('description') or 'unknown image' for mem in memories]
 
-    return {"context_summary": context_str, "chat_history": history_docs}
+    return {"conversation_summary": summary, "memory_notes": notes, "chat_history": history_docs}
 
 # ... (Baki imports same rahenge)
 
+def fast_intent(state: AgentState):
+    # Local classifier: confident cases ke liye Gemini call hi nahi
+    fast = intent_classifier.classify(state['user_message'])
+    if fast is None:
+        return None
+    print(f"⚡ Fast-path intent: {fast['intent']} ({fast['source']}, {fast['confidence']})")
+    return {"intent": fast["intent"], "mood": fast["mood"], "photo_subject": fast["photo_subject"]}
+
 async def node_analyze_intent(state: AgentState):
+    return fast_intent(state) or await llm_analyze_intent(state)
+
+async def llm_analyze_intent(state: AgentState):
     print("--- 🕵️ NODE: ANALYZING INTENT WITH CONTEXT ---")
     
     # 1. Get the last thing Luna said (Context)
@@ -99,13 +132,19 @@ async def node_analyze_intent(state: AgentState):
         )
         
         chain = prompt | llm
-        response = await chain.ainvoke({
+        variables = {
             "message": state['user_message'],
             "last_ai_msg": last_ai_msg  # 👈 Passing context here
-        })
-        
-        import json
-        txt = response.content.replace("```json", "").replace("```", "")
+        }
+
+        async def classify():
+            response = await llm_gateway.run(chain.ainvoke(variables))
+            txt = response.content.replace("```json", "").replace("```", "")
+            json.loads(txt)  # Sirf valid JSON hi cache mein jaaye
+            return txt
+
+        # Same message + same context = same intent, Gemini dobara mat bulao
+        txt = await llm_gateway.cached(prompt.format(**variables), llm.model, llm.temperature, classify)
         result = json.loads(txt)
         
         return {
@@ -142,59 +181,126 @@ async def node_select_photo(state: AgentState):
         print(f"Photo Error: {e}")
         return {"final_response": "Camera glitch! Can't send photo right now."}
 
-async def node_generate_reply(state: AgentState):
+async def node_generate_reply(state: AgentState, config: RunnableConfig = None):
     print("--- 💬 NODE: GENERATING REPLY ---")
     if state.get("final_response"): 
         return {}
 
+    parts = []
     try:
-        full_system_prompt = LUNA_SYSTEM_PROMPT + state.get('context_summary', "")
-        messages = [SystemMessage(content=full_system_prompt)]
-
-        for doc in state.get('chat_history', []):
-            content = doc.get('content', "")
-            if doc.get('role') == 'user': 
-                messages.append(HumanMessage(content=content))
-            else: 
-                messages.append(AIMessage(content=content))
-
-        current_content = state['user_message']
-        if state.get('image_analysis'):
-            current_content += f"\n[Image Context: {state['image_analysis'].get('description', '')}]"
-        
-        messages.append(HumanMessage(content=current_content))
-        response = await llm.ainvoke(messages)
-        return {"final_response": response.content}
+        # Precompiled persona + summary + history + memories, token budget ke andar
+        messages, breakdown = prompt_builder.build(
+            user_id=state['user_id'],
+            user_message=state['user_message'],
+            history=state.get('chat_history', []),
+            summary=state.get('conversation_summary', ""),
+            memories=state.get('memory_notes', []),
+            image_analysis=state.get('image_analysis')
+        )
+        print(f"🧾 Prompt Tokens: {breakdown}")
+
+        # Streaming caller (SSE) token-by-token callback deta hai
+        on_token = ((config or {}).get("configurable") or {}).get("on_token")
+
+        # Timeout pehle chunk aur chunks ke beech ke gap pe hai, poore reply pe nahi
+        async with aclosing(llm_gateway.stream(llm.astream(messages))) as chunks:
+            async for chunk in chunks:
+                if chunk.content:
+                    parts.append(chunk.content)
+                    if on_token:
+                        await on_token(chunk.content)
+        reply = "".join(parts)
+        return {"final_response": reply, "prompt_tokens": breakdown}
 
     except Exception as e:
         print(f"⚠️ LLM Error: {e}")
+        if parts:
+            # Client tak tokens pahunch chuke hain; unhe fallback text se replace mat karo
+            return {"final_response": "".join(parts)}
         return {"final_response": "My connection is fluctuating. Let's wait a moment! ✨"}
 
+async def node_analyze_speculative(state: AgentState, config: RunnableConfig = None):
+    """
+    Intent analysis and the chat reply run in parallel. Reply tokens are
+    held back until the intent is known, so a photo turn never leaks a
+    half-written chat reply to a streaming client.
+    """
+    print("--- 🏎️ NODE: SPECULATIVE INTENT + REPLY ---")
+    fast = fast_intent(state)
+    if fast:
+        # Intent pehle se pata hai, speculation ki zaroorat nahi
+        if fast["intent"] == "photo":
+            return fast
+        return {**fast, **await node_generate_reply(state, config)}
+
+    on_token = ((config or {}).get("configurable") or {}).get("on_token")
+    held_back = []
+    released = False
+
+    async def gated_token(text):
+        if released:
+            await on_token(text)
+        else:
+            held_back.append(text)
+
+    reply_config = {"configurable": {"on_token": gated_token if on_token else None}}
+    reply_task = asyncio.create_task(node_generate_reply(state, reply_config))
+    speculation_stats["turns"] += 1
+
+    try:
+        started = time.perf_counter()
+        intent = await llm_analyze_intent(state)
+        intent_ms = (time.perf_counter() - started) * 1000
+
+        if intent["intent"] == "photo":
+            reply_task.cancel()
+            speculation_stats["wasted"] += 1
+            print("🗑️ Speculation wasted: photo intent, reply cancelled")
+            return intent
+
+        speculation_stats["used"] += 1
+        speculation_stats["saved_ms"] += intent_ms
+
+        # Ruke hue tokens order mein bhejo, phir live stream
+        while held_back:
+            await on_token(held_back.pop(0))
+        released = True
+
+        reply = await reply_task
+        return {**intent, **reply}
+    finally:
+        if not reply_task.done():
+            reply_task.cancel()
+
 async def node_save_interaction(state: AgentState):
     print("--- 💾 NODE: SAVING TO DB ---")
     user_id = state['user_id']
     timestamp = datetime.datetime.utcnow()
 
-    conversations_collection.insert_one({
-        "user_id": user_id, 
-        "role": "user",
-        "content": state['user_message'], 
-        "timestamp": timestamp
-    })
-    
-    conversations_collection.insert_one({
-        "user_id": user_id, 
-        "role": "assistant",
-        "content": state['final_response'], 
-        "photo_sent": state.get('photo_url'),
-        "timestamp": timestamp
-    })
+    # Ek turn = ek batched write (user + assistant message saath mein)
+    await conversations_collection.insert_many([
+        {
+            "user_id": user_id, 
+            "role": "user",
+            "content": state['user_message'], 
+            "timestamp": timestamp
+        },
+        {
+            "user_id": user_id, 
+            "role": "assistant",
+            "content": state['final_response'], 
+            "photo_sent": state.get('photo_url'),
+            "timestamp": timestamp
+        },
+    ])
+    # Purane turns ko background mein summary mein fold karo (reply pe wait nahi)
+    schedule_summary(user_id)
     return {}
 
 # --- 4. BUILD GRAPH ---
 workflow = StateGraph(AgentState)
 workflow.add_node("retrieve", node_retrieve_context)
-workflow.add_node("analyze", node_analyze_intent)
+workflow.add_node("analyze", node_analyze_speculative if SPECULATIVE_REPLY else node_analyze_intent)
 workflow.add_node("photo", node_select_photo)
 workflow.add_node("chat", node_generate_reply)
 workflow.add_node("save", node_save_interaction)
@@ -218,8 +324,9 @@ class LunaAgentWrapper:
     def __init__(self, graph):
         self.graph = graph
 
-    async def process_message(self, user_id, message, image_analysis=None, history=None):
-        initial_state = {
+    @staticmethod
+    def _initial_state(user_id, message, image_analysis=None, history=None):
+        return {
             "user_id": user_id,
             "user_message": message or "",
             "image_analysis": image_analysis,
@@ -227,14 +334,57 @@ class LunaAgentWrapper:
             "intent": "chat",
             "mood": "neutral",
             "photo_subject": None,
-            "context_summary": "",
+            "conversation_summary": "",
+            "memory_notes": [],
+            "prompt_tokens": None,
             "final_response": "",
             "photo_url": None
         }
-        result = await self.graph.ainvoke(initial_state)
+
+    async def process_message(self, user_id, message, image_analysis=None, history=None):
+        result = await self.graph.ainvoke(self._initial_state(user_id, message, image_analysis, history))
         return {
             "reply": result.get("final_response"),
-            "photo_url": result.get("photo_url")
+            "photo_url": result.get("photo_url"),
+            "prompt_tokens": result.get("prompt_tokens")
         }
 
+    async def stream_message(self, user_id, message, image_analysis=None, history=None):
+        """
+        Yields ("token", text) as the reply is generated, then one final
+        ("done", {"reply", "photo_url"}) after the turn is saved, or
+        ("error", {"detail"}). Closing the generator cancels the run.
+        """
+        queue = asyncio.Queue()
+
+        async def on_token(text):
+            await queue.put(("token", text))
+
+        async def run():
+            try:
+                result = await self.graph.ainvoke(
+                    self._initial_state(user_id, message, image_analysis, history),
+                    config={"configurable": {"on_token": on_token}}
+                )
+                await queue.put(("done", {
+                    "reply": result.get("final_response"),
+                    "photo_url": result.get("photo_url"),
+                    "prompt_tokens": result.get("prompt_tokens")
+                }))
+            except Exception as e:
+                print(f"⚠️ Stream Error: {e}")
+                await queue.put(("error", {"detail": str(e)}))
+
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                event, data = await queue.get()
+                yield event, data
+                if event != "token":
+                    break
+        finally:
+            # Client chala gaya to LLM call bhi rok do
+            if not task.done():
+                task.cancel()
+
 luna_agent = LunaAgentWrapper(graph)
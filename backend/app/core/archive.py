@@ -0,0 +1,223 @@
+"""
+Retention + cold-tier archive for conversations.
+
+Hot store (LocalFileDB / SQLite / Mongo) mein har user ke sirf latest
+messages rehte hain. Purane turns per-user archive segments mein chale
+jaate hain: archive/<sha1(user_id)>/000001.json (format = LUNA_DB_FORMAT,
+optional zstd), plus ek chhota index.json jisme har segment ki time range
+hoti hai. History API zaroorat padne pe in segments ko page karti hai.
+
+Run once by hand (server band karke zaroori nahi):
+
+    python -m app.core.archive
+"""
+import os
+import json
+import hashlib
+import asyncio
+import datetime
+import threading
+
+from app.core.database import conversations_collection, summaries_collection, iso_ts, DB_FORMAT, DB_COMPRESS
+from app.core.serializers import get_serializer
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ARCHIVE_DIR = os.getenv("LUNA_ARCHIVE_DIR", "archive")
+# Hot store mein per user kitne messages rakhne hain
+RETENTION_KEEP_LAST = int(os.getenv("LUNA_RETENTION_KEEP_LAST", "500"))
+# Isse purane messages archive honge (0 = age rule off)
+RETENTION_MAX_AGE_DAYS = float(os.getenv("LUNA_RETENTION_MAX_AGE_DAYS", "30"))
+# Chhote chhote segments na bane, isliye kam se kam itne messages ek saath
+RETENTION_MIN_BATCH = int(os.getenv("LUNA_RETENTION_MIN_BATCH", "100"))
+# Background job interval (0 = off)
+RETENTION_INTERVAL_SECONDS = float(os.getenv("LUNA_RETENTION_INTERVAL", "3600"))
+
+def _atomic_write(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ArchiveStore:
+    """Per-user cold storage: immutable, time-ordered segment files plus a small index."""
+
+    def __init__(self, root=ARCHIVE_DIR, serializer=None):
+        self.root = root
+        self.serializer = serializer or get_serializer(DB_FORMAT, DB_COMPRESS)
+        self._lock = threading.Lock()
+
+    def _user_dir(self, user_id):
+        # Hash: "a b", "a/b", "a_b" alag users hain, aur ".." root se bahar nahi ja sakta
+        return os.path.join(self.root, hashlib.sha1(user_id.encode("utf-8")).hexdigest())
+
+    def load_index(self, user_id):
+        path = os.path.join(self._user_dir(user_id), "index.json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"segments": [], "archived_until": ""}
+
+    def write_segment(self, user_id, docs):
+        """Append one segment (docs sorted oldest-first) and update the user's index."""
+        if not docs:
+            return None
+        with self._lock:
+            user_dir = self._user_dir(user_id)
+            os.makedirs(user_dir, exist_ok=True)
+            index = self.load_index(user_id)
+
+            filename = f"{len(index['segments']) + 1:06d}{self.serializer.extension}"
+            _atomic_write(os.path.join(user_dir, filename), self.serializer.dumps_snapshot(docs))
+
+            segment = {
+                "file": filename,
+                "start": iso_ts(docs[0].get("timestamp")),
+                "end": iso_ts(docs[-1].get("timestamp")),
+                "count": len(docs),
+            }
+            index["segments"].append(segment)
+            index["archived_until"] = max(index["archived_until"], segment["end"])
+            # Index segment ke baad likho: crash hua to segment orphan rahega, data nahi jayega
+            _atomic_write(os.path.join(user_dir, "index.json"), json.dumps(index).encode("utf-8"))
+            return segment
+
+    def read_segment(self, user_id, segment):
+        with open(os.path.join(self._user_dir(user_id), segment["file"]), "rb") as f:
+            return self.serializer.loads_snapshot(f.read())
+
+    def count(self, user_id):
+        return sum(seg["count"] for seg in self.load_index(user_id)["segments"])
+
+    def find(self, user_id, before=None, after=None, limit=50, newest_first=True):
+        """
+        Page through archived messages. `before`/`after` are exclusive
+        timestamp bounds; only segments overlapping the range are read.
+        """
+        before, after = iso_ts(before), iso_ts(after)
+        segments = self.load_index(user_id)["segments"]
+        if newest_first:
+            segments = list(reversed(segments))
+
+        results = []
+        for seg in segments:
+            if before and seg["start"] >= before:
+                continue
+            if after and seg["end"] <= after:
+                continue
+            docs = self.read_segment(user_id, seg)
+            if newest_first:
+                docs = list(reversed(docs))
+            for doc in docs:
+                if doc.get("user_id") != user_id:
+                    continue
+                ts = iso_ts(doc.get("timestamp"))
+                if (before and ts >= before) or (after and ts <= after):
+                    continue
+                results.append(doc)
+                if limit and len(results) >= limit:
+                    return results
+        return results
+
+archive_store = ArchiveStore()
+
+# --- Retention Policy ---
+
+async def apply_retention(user_id, keep_last=RETENTION_KEEP_LAST, max_age_days=RETENTION_MAX_AGE_DAYS,
+                          min_batch=RETENTION_MIN_BATCH):
+    """
+    Move one user's old turns from the hot store into the archive. Only turns
+    already folded into the rolling summary are moved. Returns how many moved.
+    """
+    boundary = None  # Raw timestamp value, taaki Mongo mein bhi type match kare
+
+    # Rule 1: sirf last `keep_last` messages hot rahein
+    total = await conversations_collection.count_documents({"user_id": user_id})
+    excess = total - keep_last
+    if excess > 0:
+        oldest = await conversations_collection.find({"user_id": user_id}).sort("timestamp", 1).skip(excess - 1).to_list(1)
+        if oldest:
+            boundary = oldest[0].get("timestamp")
+
+    # Rule 2: `max_age_days` se purane messages
+    if max_age_days:
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=max_age_days)
+        newest_old = await conversations_collection.find(
+            {"user_id": user_id, "timestamp": {"$lt": cutoff}}
+        ).sort("timestamp", -1).to_list(1)
+        if newest_old and iso_ts(newest_old[0].get("timestamp")) > iso_ts(boundary):
+            boundary = newest_old[0].get("timestamp")
+
+    if boundary is None:
+        return 0
+
+    # Summary mein fold hone se pehle archive kiya to turn prompt se gayab ho jaata (na summary, na last K)
+    summary = await summaries_collection.find({"user_id": user_id}).sort("timestamp", -1).to_list(1)
+    covered_until = summary[0].get("covered_until") if summary else None
+    if covered_until is None:
+        return 0
+    if iso_ts(covered_until) < iso_ts(boundary):
+        boundary = covered_until
+
+    # Same timestamp wale user+assistant messages saath mein hi jayenge
+    query = {"user_id": user_id, "timestamp": {"$lte": boundary}}
+    docs = await conversations_collection.find(query).sort("timestamp", 1).to_list(None)
+    if len(docs) < min_batch:
+        return 0
+
+    # Pichli baar crash archive aur delete ke beech hua ho to woh docs dobara archive mat karo
+    archived_until = archive_store.load_index(user_id)["archived_until"]
+    fresh = [doc for doc in docs if iso_ts(doc.get("timestamp")) > archived_until]
+    if fresh:
+        await asyncio.to_thread(archive_store.write_segment, user_id, fresh)
+
+    await conversations_collection.delete_many(query)
+    return len(docs)
+
+def _try_retention_lock():
+    # Multiple workers mein se sirf ek hi retention chalaye
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    fd = os.open(os.path.join(ARCHIVE_DIR, ".retention.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+    if fcntl:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+    return fd
+
+async def run_retention():
+    fd = _try_retention_lock()
+    if fd is None:
+        return 0
+    try:
+        moved = 0
+        for user_id in await conversations_collection.distinct("user_id"):
+            try:
+                moved += await apply_retention(user_id)
+            except Exception as e:
+                print(f"⚠️ Retention Error for {user_id}: {e}")
+        if moved:
+            print(f"🧊 Retention: Archived {moved} old messages")
+        return moved
+    finally:
+        os.close(fd)
+
+async def retention_loop(interval=RETENTION_INTERVAL_SECONDS):
+    if interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_retention()
+        except Exception as e:
+            print(f"⚠️ Retention Loop Error: {e}")
+
+if __name__ == "__main__":
+    print(f"Archived {asyncio.run(run_retention())} messages")
@@ -1,50 +1,549 @@
 import os
-import json
+import asyncio
+import atexit
 import datetime
+import sqlite3
+import threading
+import time
+import uuid
+import heapq
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from bisect import insort, bisect_left, bisect_right
+from itertools import islice
 from typing import List, Optional
 
-# ✅ Using Local DB Logic
-USE_LOCAL_DB = True 
+from app.core.serializers import get_serializer
+
+try:
+    import fcntl  # POSIX only; Windows pe single-process mode
+except ImportError:
+    fcntl = None
+
+# ✅ Using Local DB Logic (MONGO_URL set ho to Motor use hoga)
+# LUNA_DB_BACKEND: "file" (LocalFileDB, default) ya "sqlite"
+MONGO_URL = os.getenv("MONGO_URL")
+DB_NAME = os.getenv("DB_NAME", "luna_ai")
+DB_BACKEND = "mongo" if MONGO_URL else os.getenv("LUNA_DB_BACKEND", "file").lower()
+USE_LOCAL_DB = DB_BACKEND != "mongo"
+SQLITE_PATH = os.getenv("LUNA_SQLITE_PATH", "luna_memory.db")
+
+# Background compaction tuning (snapshot + log ko merge karne ke liye)
+COMPACT_INTERVAL_SECONDS = float(os.getenv("LUNA_DB_COMPACT_INTERVAL", "60"))
+COMPACT_MIN_OPS = int(os.getenv("LUNA_DB_COMPACT_MIN_OPS", "500"))
+# Log fsync: 0 = har batch pe fsync, N = max N seconds ka data risk pe, -1 = OS pe chhod do
+FSYNC_INTERVAL_SECONDS = float(os.getenv("LUNA_DB_FSYNC_INTERVAL", "1"))
+# On-disk format: json | orjson (same file, faster) | msgpack; snapshot compression: none | zstd
+DB_FORMAT = os.getenv("LUNA_DB_FORMAT", "orjson")
+DB_COMPRESS = os.getenv("LUNA_DB_COMPRESS", "none")
+
+def iso_ts(value):
+    """
+    Comparable form of a stored value, used for every sort and range check:
+    datetime -> ISO string (so it orders with legacy ISO-string timestamps),
+    None -> "", anything else unchanged.
+    """
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return "" if value is None else value
+
+def _ts_key(doc):
+    return iso_ts(doc.get("timestamp"))
+
+def _copy_doc(doc):
+    # Caller ko apni copy milti hai: memory wala doc badla to log / baaki workers se alag ho jayega.
+    # Docs flat hain (lists of tags/floats), isliye ek level neeche tak copy kaafi hai.
+    return {k: v.copy() if isinstance(v, (list, dict)) else v for k, v in doc.items()}
+
+_OPERATORS = {
+    "$gt": lambda a, b: a is not None and iso_ts(a) > iso_ts(b),
+    "$gte": lambda a, b: a is not None and iso_ts(a) >= iso_ts(b),
+    "$lt": lambda a, b: a is not None and iso_ts(a) < iso_ts(b),
+    "$lte": lambda a, b: a is not None and iso_ts(a) <= iso_ts(b),
+    "$ne": lambda a, b: a != b,
+    "$in": lambda a, b: a in b,
+}
+
+def _is_range(cond):
+    return isinstance(cond, dict) and cond and set(cond) <= {"$gt", "$gte", "$lt", "$lte"}
+
+def _matches(doc, query):
+    """Tiny subset of Mongo filters: equality plus $gt/$gte/$lt/$lte/$ne/$in."""
+    for field, cond in query.items():
+        value = doc.get(field)
+        if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+            for op, arg in cond.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f"Unsupported query operator: {op}")
+                if not _OPERATORS[op](value, arg):
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+class DeleteResult:
+    # Motor/PyMongo jaisa result object
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+
+class Cursor:
+    """
+    Lazy pseudo-MongoDB cursor.
+
+    find() only records the filter; sort(), skip() and limit() just record
+    their arguments. Nothing is read until the cursor is iterated, at which
+    point the whole plan is handed to the collection in one go so it can use
+    its indexes (e.g. read only `limit` rows from the per-user index).
+    """
+
+    def __init__(self, collection, query=None):
+        self._collection = collection
+        self._query = dict(query or {})
+        self._sort = None
+        self._skip = 0
+        self._limit = None
+
+    def sort(self, key, direction=1):
+        self._sort = (key, direction)
+        return self
+
+    def skip(self, n):
+        self._skip = max(0, int(n))
+        return self
+
+    def limit(self, n):
+        # Mongo ki tarah: limit(0) ka matlab no limit
+        self._limit = int(n) or None
+        return self
+
+    def __iter__(self):
+        return iter(self._collection._execute(self._query, self._sort, self._skip, self._limit))
 
 class LocalFileDB:
-    def __init__(self, filename="luna_memory.json"):
-        self.filename = filename
-        self._ensure_file()
+    """
+    In-memory document store backed by a snapshot plus an append-only log.
+
+    Reads are served from memory, and each collection keeps a per-user_id
+    index whose rows stay ordered by timestamp. Every write is appended to
+    the log as one record, so an insert costs O(doc) instead of rewriting
+    the whole file. The encoding (JSON/orjson/msgpack, optional zstd for
+    snapshots) comes from app.core.serializers and keeps datetimes typed.
+    On startup the snapshot is loaded and the log is replayed on top of
+    it. A background thread periodically folds the log back into the
+    snapshot.
+
+    The log is also the channel between processes (uvicorn --workers N).
+    Appends happen under an exclusive flock on a sidecar lock file, after
+    first replaying whatever other workers appended, so sequence numbers
+    stay global. Readers stat() the log and only catch up when it changed.
+    """
+
+    def __init__(self, filename=None, serializer=None, compact_interval=COMPACT_INTERVAL_SECONDS,
+                 compact_min_ops=COMPACT_MIN_OPS, fsync_interval=FSYNC_INTERVAL_SECONDS):
+        self.serializer = serializer or get_serializer(DB_FORMAT, DB_COMPRESS)
+        # Default: luna_memory.json (json/orjson), luna_memory.msgpack(.zst) etc.
+        self.filename = filename or "luna_memory" + self.serializer.extension
+        if self.filename.endswith(self.serializer.extension):
+            base = self.filename[:-len(self.serializer.extension)]
+        else:
+            base = os.path.splitext(self.filename)[0]
+        self.log_filename = base + self.serializer.log_suffix
+        self.lock_filename = base + ".lock"
+        self.compact_lock_filename = base + ".compact.lock"
+        self.compact_interval = compact_interval
+        self.compact_min_ops = compact_min_ops
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.RLock()      # In-memory data ke liye
+        self._plock = threading.Lock()      # flock ownership (flock per-fd hota hai, per-thread nahi)
+        self._compact_lock = threading.Lock()
+        self._data = {}
+        self._by_user = {}     # collection -> user_id -> rows ordered by timestamp
+        self._seq = 0          # Har log entry ka (global) sequence number
+        self._log_ops = 0      # Last compaction ke baad kitne ops log mein hain
+        self._log_fd = None
+        self._log_ino = None
+        self._log_offset = 0   # Log ka kitna hissa is process ne padh liya
+        self._dirty = False    # Log mein aisa data jo abhi fsync nahi hua
+        self._last_fsync = time.monotonic()
+
+        if fcntl is None:
+            print("⚠️ DB: fcntl not available, multi-process writes are NOT safe")
+        self._lock_fd = os.open(self.lock_filename, os.O_RDWR | os.O_CREAT, 0o644)
+
+        with self._process_lock():
+            self._ensure_file()
+            self._load()
+
+        self._stop = threading.Event()
+        self._compactor = threading.Thread(target=self._compaction_loop, name="luna-db-compactor", daemon=True)
+        self._compactor.start()
+        atexit.register(self.close)
 
     def _ensure_file(self):
         # Agar file nahi hai to banayein aur empty structure likhein
         if not os.path.exists(self.filename):
-            with open(self.filename, "w") as f:
-                json.dump({
-                    "conversations": [], 
-                    "visual_memories": [], 
+            with open(self.filename, "wb") as f:
+                f.write(self.serializer.dumps_snapshot({
+                    "conversations": [],
+                    "visual_memories": [],
                     "generated_images": [], # 👈 Yeh zaroori tha
                     "users": []
-                }, f)
+                }))
 
     def _read_data(self):
         try:
-            with open(self.filename, "r") as f:
-                return json.load(f)
+            with open(self.filename, "rb") as f:
+                return self.serializer.loads_snapshot(f.read())
         except:
             return {"conversations": [], "visual_memories": [], "generated_images": [], "users": []}
 
     def _write_data(self, data):
-        with open(self.filename, "w") as f:
-            json.dump(data, f, indent=2, default=str)
+        # Atomic replace: crash ke beech mein bhi purana snapshot safe rahega
+        tmp_path = self.filename + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.serializer.dumps_snapshot(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filename)
+
+    # --- Cross-Process Locking ---
+
+    @contextmanager
+    def _process_lock(self):
+        """Exclusive lock across threads *and* worker processes."""
+        with self._plock:
+            if fcntl:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open_log(self):
+        if self._log_fd is not None:
+            os.close(self._log_fd)
+        self._log_fd = os.open(self.log_filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._log_ino = os.fstat(self._log_fd).st_ino
+        self._log_offset = 0
+
+    # --- Snapshot + Log Recovery ---
+
+    def _load(self):
+        # Caller must hold the process lock
+        data = self._read_data()
+        meta = data.pop("_meta", {}) or {}
+
+        with self._lock:
+            self._data = {}
+            self._by_user = {}
+            for name, rows in data.items():
+                self._data.setdefault(name, {})
+                for i, doc in enumerate(rows):
+                    # Purane docs ke paas _id nahi hai; position se deterministic id (sab workers same)
+                    doc.setdefault("_id", f"{name}:{i}")
+                    self._insert_local(name, doc)
+            self._seq = meta.get("seq", 0)
+            self._log_ops = 0
+
+        self._open_log()
+        self._catch_up(truncate_torn=True)
+
+    def _catch_up(self, truncate_torn=False):
+        """Replay log entries written (by any process) since we last looked."""
+        # Caller must hold the process lock
+        st = os.stat(self.log_filename) if os.path.exists(self.log_filename) else None
+        if st is None or st.st_ino != self._log_ino:
+            # Kisi aur worker ne compaction karke log replace kar diya
+            self._open_log()
+            st = os.fstat(self._log_fd)
+            self._log_ops = 0
+        if st.st_size <= self._log_offset:
+            return
+
+        with open(self.log_filename, "rb") as f:
+            f.seek(self._log_offset)
+            raw = f.read()
+
+        consumed = 0
+        with self._lock:
+            # iter_frames torn write (crash ke time adhoora record) pe ruk jata hai
+            for entry, size in self.serializer.iter_frames(raw):
+                consumed += size
+
+                if entry.get("op") == "base":
+                    if entry["seq"] > self._seq:
+                        # Jo entries humne miss ki woh compact ho chuki hain -> full reload
+                        return self._load()
+                    continue
+                if entry.get("seq", 0) <= self._seq:
+                    continue  # Already snapshot/memory mein hai
+                self._apply(entry)
+                self._seq = entry["seq"]
+                self._log_ops += 1
+
+        self._log_offset += consumed
+        if truncate_torn and consumed < len(raw):
+            print(f"⚠️ DB: Dropping {len(raw) - consumed} corrupt bytes from log tail")
+            os.truncate(self.log_filename, self._log_offset)
+
+    def _sync(self):
+        # Fast path: log badla hi nahi to lock bhi mat lo (sirf ek stat call)
+        try:
+            st = os.stat(self.log_filename)
+            if st.st_ino == self._log_ino and st.st_size == self._log_offset:
+                return
+        except FileNotFoundError:
+            pass
+        with self._process_lock():
+            self._catch_up()
+
+    def _apply(self, entry):
+        op = entry.get("op")
+        if op == "insert":
+            self._insert_local(entry["c"], entry["doc"])
+        elif op == "delete":
+            self._delete_local(entry["c"], entry["ids"])
+
+    def _insert_local(self, name, doc):
+        # Caller must hold self._lock (ya load ke time single-threaded ho)
+        self._data.setdefault(name, {})[doc["_id"]] = doc
+
+        user_id = doc.get("user_id")
+        if user_id is None:
+            return
+        rows = self._by_user.setdefault(name, {}).setdefault(user_id, [])
+        # Normal case: naya doc sabse latest hota hai, to seedha append
+        if not rows or _ts_key(rows[-1]) <= _ts_key(doc):
+            rows.append(doc)
+        else:
+            insort(rows, doc, key=_ts_key)
+
+    def _delete_local(self, name, ids):
+        rows = self._data.get(name, {})
+        users = set()
+        for _id in ids:
+            doc = rows.pop(_id, None)
+            if doc is not None and doc.get("user_id") is not None:
+                users.add(doc["user_id"])
+
+        index = self._by_user.get(name, {})
+        for user_id in users:
+            remaining = [d for d in index.get(user_id, []) if d["_id"] in rows]
+            if remaining:
+                index[user_id] = remaining
+            else:
+                index.pop(user_id, None)
+
+    def _user_rows(self, name, user_id):
+        return self._by_user.get(name, {}).get(user_id, [])
+
+    def write_batch(self, ops):
+        """Insert several (collection, docs) groups with one log write and at most one fsync."""
+        entries = []
+        for name, docs in ops:
+            for doc in docs:
+                # Mongo ki tarah caller ke doc mein hi _id set hota hai, store apni copy rakhta hai
+                doc.setdefault("_id", uuid.uuid4().hex)
+                entries.append({"op": "insert", "c": name, "doc": _copy_doc(doc)})
+        if entries:
+            self._append_many(entries)
+
+    def delete_where(self, name, query):
+        """Delete every doc matching `query`; returns how many were removed."""
+        with self._process_lock():
+            self._catch_up()
+            with self._lock:
+                ids = [doc["_id"] for doc in self._select(name, query)]
+                if ids:
+                    self._append_locked([{"op": "delete", "c": name, "ids": ids}])
+        return len(ids)
+
+    def _append_many(self, entries):
+        """Write-ahead: append entries to the shared log, then apply them in memory."""
+        with self._process_lock():
+            # Pehle doosre workers ki entries padho, taaki seq global rahe
+            self._catch_up()
+            with self._lock:
+                self._append_locked(entries)
+
+    def _append_locked(self, entries):
+        # Caller must hold the process lock and self._lock
+        records = []
+        for i, entry in enumerate(entries, start=1):
+            entry["seq"] = self._seq + i
+            records.append(self.serializer.frame(entry))
+        data = memoryview(b"".join(records))
+        while data:
+            written = os.write(self._log_fd, data)
+            data = data[written:]
+            self._log_offset += written
+
+        self._seq += len(entries)
+        self._log_ops += len(entries)
+        for entry in entries:
+            self._apply(entry)
+
+        self._dirty = True
+        self._maybe_fsync()
+
+    def _maybe_fsync(self, force=False):
+        # Caller must hold self._plock
+        if not self._dirty or self._log_fd is None:
+            return
+        if self.fsync_interval < 0 and not force:
+            return
+        if force or time.monotonic() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._log_fd)
+            self._dirty = False
+            self._last_fsync = time.monotonic()
+
+    # --- Background Compaction ---
+
+    def compact(self):
+        """Fold the log into a fresh snapshot and truncate the log."""
+        with self._compact_lock:
+            compact_fd = os.open(self.compact_lock_filename, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    try:
+                        fcntl.flock(compact_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        return False  # Koi aur worker already compact kar raha hai
+                self._compact_locked()
+                return True
+            finally:
+                os.close(compact_fd)
+
+    def _compact_locked(self):
+        with self._process_lock():
+            self._catch_up()
+            with self._lock:
+                seq = self._seq
+                snapshot = {name: list(rows.values()) for name, rows in self._data.items()}
+            start_offset = self._log_offset
+
+        # Heavy serialization locks ke bahar, taaki inserts block na hon
+        snapshot["_meta"] = {"seq": seq}
+        self._write_data(snapshot)
+
+        with self._process_lock():
+            # Snapshot likhte waqt jo entries aayi (kisi bhi worker se) woh naye log mein jayengi
+            self._catch_up()
+            with open(self.log_filename, "rb") as f:
+                f.seek(start_offset)
+                tail = f.read(self._log_offset - start_offset)
+
+            tmp_path = self.log_filename + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self.serializer.frame({"op": "base", "seq": seq}))
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.log_filename)
+
+            self._open_log()
+            self._log_offset = os.fstat(self._log_fd).st_size
+            self._log_ops = self._seq - seq
+
+    def _compaction_loop(self):
+        # fsync_interval chhota ho to thread utni jaldi uthta hai, taaki idle log bhi durable ho jaye
+        tick = self.compact_interval
+        if self.fsync_interval > 0:
+            tick = min(tick, self.fsync_interval)
+        last_compact = time.monotonic()
+
+        while not self._stop.wait(tick):
+            if self._dirty and self.fsync_interval >= 0:
+                with self._plock:
+                    self._maybe_fsync(force=True)
+            if time.monotonic() - last_compact < self.compact_interval:
+                continue
+            last_compact = time.monotonic()
+            if self._log_ops < self.compact_min_ops:
+                continue
+            try:
+                if self.compact():
+                    print(f"🗜️ DB: Compacted snapshot at seq {self._seq}")
+            except Exception as e:
+                print(f"⚠️ DB Compaction Error: {e}")
+
+    def close(self):
+        self._stop.set()
+        with self._plock:
+            if self._log_fd is not None:
+                self._maybe_fsync(force=True)
+                os.close(self._log_fd)
+                self._log_fd = None
+
+    @staticmethod
+    def _ts_bounds(rows, cond):
+        # Keyset range -> [lo, hi) indices in a timestamp-ordered list, O(log n)
+        lo, hi = 0, len(rows)
+        for op, value in cond.items():
+            key = iso_ts(value)
+            if op == "$gt":
+                lo = max(lo, bisect_right(rows, key, key=_ts_key))
+            elif op == "$gte":
+                lo = max(lo, bisect_left(rows, key, key=_ts_key))
+            elif op == "$lt":
+                hi = min(hi, bisect_left(rows, key, key=_ts_key))
+            elif op == "$lte":
+                hi = min(hi, bisect_right(rows, key, key=_ts_key))
+        return lo, max(lo, hi)
+
+    def _select(self, name, query, sort=None, skip=0, limit=None):
+        """Run a query plan against memory. Caller must hold self._lock."""
+        key, direction = sort or (None, 1)
+        user_id = query.get("user_id")
+        uses_index = isinstance(user_id, str) and key in (None, "timestamp")
+
+        if uses_index:
+            # Per-user index already timestamp-ordered -> sirf zaroori rows padho
+            rows = self._user_rows(name, user_id)
+            rest = {k: v for k, v in query.items() if k != "user_id"}
+            lo, hi = 0, len(rows)
+            if _is_range(rest.get("timestamp")):
+                lo, hi = self._ts_bounds(rows, rest.pop("timestamp"))
+            if not rest:
+                if direction == -1:
+                    stop = max(lo, hi - skip)
+                    start = lo if limit is None else max(lo, stop - limit)
+                    return rows[start:stop][::-1]
+                start = lo + skip
+                return rows[start:hi if limit is None else min(hi, start + limit)]
+            positions = range(hi - 1, lo - 1, -1) if direction == -1 else range(lo, hi)
+            matched = (rows[i] for i in positions if _matches(rows[i], rest))
+            return list(islice(matched, skip, None if limit is None else skip + limit))
+
+        matched = [doc for doc in self._data.get(name, {}).values() if _matches(doc, query)]
+
+        if key is None:
+            return matched[skip:None if limit is None else skip + limit]
+
+        sort_key = lambda doc: iso_ts(doc.get(key))
+        if limit is not None:
+            # Top-k: poora sort karne ki zaroorat nahi
+            pick = heapq.nlargest if direction == -1 else heapq.nsmallest
+            return pick(skip + limit, matched, key=sort_key)[skip:]
+        return sorted(matched, key=sort_key, reverse=(direction == -1))[skip:]
 
     # --- Pseudo-MongoDB Properties ---
-    
+
     @property
     def conversations(self): return self._Collection(self, "conversations")
-    
+
     @property
     def visual_memories(self): return self._Collection(self, "visual_memories")
-    
+
     # 👇 THIS WAS MISSING (Ab add kar diya hai)
     @property
     def generated_images(self): return self._Collection(self, "generated_images")
 
+    @property
+    def conversation_summaries(self): return self._Collection(self, "conversation_summaries")
+
     # --- Mock Collection Class ---
     class _Collection:
         def __init__(self, db_instance, name):
@@ -52,43 +551,385 @@ class LocalFileDB:
             self.name = name
 
         def find(self, query=None):
-            data = self.db._read_data()
-            rows = data.get(self.name, [])
-            
-            # Simple User ID Filter
-            if query and "user_id" in query:
-                rows = [r for r in rows if r.get("user_id") == query["user_id"]]
-            
-            # Sort & Limit Mock (chaining methods)
-            class Cursor(list):
-                def sort(self, key, direction=1):
-                    try:
-                        self.sort(key=lambda x: x.get(key, ""), reverse=(direction == -1))
-                    except: pass
-                    return self
-                def limit(self, n):
-                    return self[:n]
+            return Cursor(self, query)
+
+        def _execute(self, query, sort, skip, limit):
+            # Doosre workers ke writes bhi dikhne chahiye
+            self.db._sync()
+            with self.db._lock:
+                return [_copy_doc(doc) for doc in self.db._select(self.name, query, sort, skip, limit)]
+
+        def insert_one(self, doc):
+            # Pehle log mein likho, fir memory mein (write-ahead)
+            self.db.write_batch([(self.name, [doc])])
+            return True
 
-            return Cursor(rows)
+        def insert_many(self, docs):
+            self.db.write_batch([(self.name, list(docs))])
+            return True
+
+        def delete_many(self, query):
+            return DeleteResult(self.db.delete_where(self.name, query or {}))
+
+        def count_documents(self, query=None):
+            query = query or {}
+            self.db._sync()
+            with self.db._lock:
+                if set(query) == {"user_id"}:
+                    return len(self.db._user_rows(self.name, query["user_id"]))
+                return len(self.db._select(self.name, query))
+
+        def distinct(self, field, query=None):
+            self.db._sync()
+            with self.db._lock:
+                if field == "user_id" and not query:
+                    return list(self.db._by_user.get(self.name, {}))
+                values = []
+                for doc in self.db._select(self.name, query or {}):
+                    value = doc.get(field)
+                    if value is not None and value not in values:
+                        values.append(value)
+                return values
+
+class SQLiteDB:
+    """
+    Embedded SQLite backend with the same pseudo-Mongo collection interface.
+
+    Each collection is a table of JSON documents with user_id and timestamp
+    pulled out into real columns, indexed on (user_id, timestamp). WAL mode
+    gives concurrent readers alongside one writer, across worker processes,
+    and memory stays bounded no matter how big the dataset gets.
+    """
+
+    COLLECTIONS = ("conversations", "visual_memories", "generated_images", "conversation_summaries", "users")
+
+    def __init__(self, filename=SQLITE_PATH, legacy_db=None):
+        self.filename = filename
+        # doc column JSON hi rehna chahiye (json_extract ke liye), isliye orjson/json
+        self.serializer = get_serializer("orjson")
+        self._local = threading.local()
+        is_new = not os.path.exists(filename)
+
+        conn = self._conn()
+        with conn:
+            for name in self.COLLECTIONS:
+                self._create_table(conn, name)
+
+        # Pehli baar chal raha hai to purani LocalFileDB (snapshot + log) ka data import kar lo.
+        # Default: wahi file jo LUNA_DB_FORMAT / LUNA_DB_COMPRESS se LocalFileDB kholta
+        legacy_serializer = get_serializer(DB_FORMAT, DB_COMPRESS)
+        legacy_db = legacy_db or "luna_memory" + legacy_serializer.extension
+        if is_new and os.path.exists(legacy_db):
+            self._import_local(legacy_db, legacy_serializer)
+
+    def _conn(self):
+        # Ek connection per thread; sqlite3 har connection pe compiled statements cache karta hai
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.filename, timeout=30, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _create_table(self, conn, name):
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" ('
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT, timestamp TEXT, doc TEXT NOT NULL)"
+        )
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{name}_user_ts" ON "{name}" (user_id, timestamp, id)')
+
+    def _import_local(self, path, serializer):
+        # migrate_db.migrate jaisa: snapshot load + log replay, taaki recent turns/deletes na chhootein
+        try:
+            src = LocalFileDB(path, serializer=serializer)
+            try:
+                with src._process_lock():
+                    src._catch_up()
+                    with src._lock:
+                        data = {name: list(rows.values()) for name, rows in src._data.items()}
+            finally:
+                src.close()
+        except Exception as e:
+            print(f"⚠️ SQLite: Could not import {path}: {e}")
+            return
+        conn = self._conn()
+        with conn:
+            for name, rows in data.items():
+                self._create_table(conn, name)
+                conn.executemany(
+                    f'INSERT INTO "{name}" (user_id, timestamp, doc) VALUES (?, ?, ?)',
+                    [(doc.get("user_id"), _ts_key(doc), self.serializer.dumps(doc).decode("utf-8"))
+                     for doc in sorted(rows, key=_ts_key)],
+                )
+        print(f"📥 SQLite: Imported legacy data from {path} ({sum(len(rows) for rows in data.values())} docs)")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def write_batch(self, ops):
+        """Insert several (collection, docs) groups in a single transaction."""
+        conn = self._conn()
+        with conn:
+            for name, docs in ops:
+                for doc in docs:
+                    doc.setdefault("_id", uuid.uuid4().hex)
+                conn.executemany(
+                    f'INSERT INTO "{name}" (user_id, timestamp, doc) VALUES (?, ?, ?)',
+                    [(doc.get("user_id"), _ts_key(doc), self.serializer.dumps(doc).decode("utf-8")) for doc in docs],
+                )
+
+    # --- Pseudo-MongoDB Properties ---
+
+    @property
+    def conversations(self): return self._Collection(self, "conversations")
+
+    @property
+    def visual_memories(self): return self._Collection(self, "visual_memories")
+
+    @property
+    def generated_images(self): return self._Collection(self, "generated_images")
+
+    @property
+    def conversation_summaries(self): return self._Collection(self, "conversation_summaries")
+
+    class _Collection:
+        # Indexed columns; baaki fields json_extract se filter hote hain
+        COLUMNS = {"user_id": "user_id", "timestamp": "timestamp"}
+        SQL_OPS = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<=", "$ne": "IS NOT"}
+
+        def __init__(self, db_instance, name):
+            self.db = db_instance
+            self.name = name
+
+        def _column(self, field):
+            if field in self.COLUMNS:
+                return self.COLUMNS[field], []
+            return "json_extract(doc, ?)", [f'$."{field}"']
+
+        def _where(self, query):
+            clauses, params = [], []
+            for field, cond in query.items():
+                column, col_params = self._column(field)
+                if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+                    ops = cond.items()
+                else:
+                    ops = [("$eq", cond)]
+                for op, arg in ops:
+                    if op == "$in":
+                        args = [iso_ts(a) for a in arg]
+                        if not args:
+                            clauses.append("0")
+                            continue
+                        clauses.append(f"{column} IN ({', '.join('?' * len(args))})")
+                        params += col_params + args
+                    elif op == "$eq":
+                        clauses.append(f"{column} IS ?")
+                        params += col_params + [None if arg is None else iso_ts(arg)]
+                    elif op in self.SQL_OPS:
+                        clauses.append(f"{column} {self.SQL_OPS[op]} ?")
+                        params += col_params + [None if arg is None else iso_ts(arg)]
+                    else:
+                        raise ValueError(f"Unsupported query operator: {op}")
+            return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+        def find(self, query=None):
+            return Cursor(self, query)
+
+        def _execute(self, query, sort, skip, limit):
+            where, params = self._where(query)
+            sql = f'SELECT doc FROM "{self.name}"{where}'
+
+            key, direction = sort or (None, 1)
+            order = "DESC" if direction == -1 else "ASC"
+            if key is None:
+                sql += " ORDER BY id"
+            else:
+                column, col_params = self._column(key)
+                sql += f" ORDER BY {column} {order}, id {order}"
+                params += col_params
+
+            if limit is not None or skip:
+                sql += " LIMIT ? OFFSET ?"
+                params += [-1 if limit is None else limit, skip]
+
+            rows = self.db._conn().execute(sql, params).fetchall()
+            loads = self.db.serializer.loads
+            return [loads(doc.encode("utf-8")) for (doc,) in rows]
+
+        def delete_many(self, query):
+            where, params = self._where(query or {})
+            conn = self.db._conn()
+            with conn:
+                cursor = conn.execute(f'DELETE FROM "{self.name}"{where}', params)
+            return DeleteResult(cursor.rowcount)
+
+        def count_documents(self, query=None):
+            where, params = self._where(query or {})
+            return self.db._conn().execute(f'SELECT COUNT(*) FROM "{self.name}"{where}', params).fetchone()[0]
+
+        def distinct(self, field, query=None):
+            column, col_params = self._column(field)
+            where, params = self._where(query or {})
+            sql = f'SELECT DISTINCT {column} FROM "{self.name}"{where}'
+            rows = self.db._conn().execute(sql, col_params + params).fetchall()
+            return [value for (value,) in rows if value is not None]
 
         def insert_one(self, doc):
-            data = self.db._read_data()
-            if self.name not in data: data[self.name] = []
-            
-            # Fix Datetime for JSON
-            if "timestamp" in doc and isinstance(doc["timestamp"], datetime.datetime):
-                doc["timestamp"] = doc["timestamp"].isoformat()
-                
-            data[self.name].append(doc)
-            self.db._write_data(data)
+            self.db.write_batch([(self.name, [doc])])
             return True
 
+        def insert_many(self, docs):
+            self.db.write_batch([(self.name, list(docs))])
+            return True
+
+# --- Async Access Layer ---
+# Routers async hain, isliye DB kaam ek dedicated I/O thread pe chalta hai.
+# API Motor jaisi hai: `await col.insert_one(doc)` aur
+# `await col.find(q).sort(...).limit(n).to_list(n)`, taaki dono backends same code se chalein.
+
+class AsyncCursor:
+    def __init__(self, cursor, executor):
+        self._cursor = cursor
+        self._executor = executor
+
+    def sort(self, key, direction=1):
+        self._cursor.sort(key, direction)
+        return self
+
+    def skip(self, n):
+        self._cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        # Motor jaisa: min(limit, length), pehle wala .limit() overwrite nahi hota
+        if length and (self._cursor._limit is None or length < self._cursor._limit):
+            self._cursor.limit(length)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, list, self._cursor)
+
+    async def __aiter__(self):
+        for doc in await self.to_list():
+            yield doc
+
+class WriteCoalescer:
+    """
+    Group commit for the async layer.
+
+    Inserts from concurrent requests queue up here; a single job on the DB
+    I/O thread drains everything queued so far into one db.write_batch()
+    call, i.e. one lock round, one log write and at most one fsync.
+    """
+
+    def __init__(self, db, executor):
+        self.db = db
+        self._executor = executor
+        self._pending = []
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.docs = 0
+
+    async def insert(self, name, docs):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._pending.append((name, docs, future, loop))
+            first = len(self._pending) == 1
+        if first:
+            loop.run_in_executor(self._executor, self._flush)
+        return await future
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        error = None
+        try:
+            self.db.write_batch([(name, docs) for name, docs, _, _ in batch])
+            self.batches += 1
+            self.docs += sum(len(docs) for _, docs, _, _ in batch)
+        except Exception as e:
+            error = e
+
+        for _, _, future, loop in batch:
+            loop.call_soon_threadsafe(_resolve, future, error)
+
+def _resolve(future, error):
+    if future.done():
+        return  # Request cancel ho gayi
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result(True)
+
+class AsyncCollection:
+    """Awaitable wrapper around a sync collection; all calls run on the DB I/O thread."""
+
+    def __init__(self, collection, executor, writer):
+        self.sync = collection
+        self._executor = executor
+        self._writer = writer
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def find(self, query=None):
+        return AsyncCursor(self.sync.find(query), self._executor)
+
+    async def insert_one(self, doc):
+        return await self._writer.insert(self.sync.name, [doc])
+
+    async def insert_many(self, docs):
+        return await self._writer.insert(self.sync.name, list(docs))
+
+    async def delete_many(self, query):
+        return await self._run(self.sync.delete_many, query)
+
+    async def count_documents(self, query=None):
+        return await self._run(self.sync.count_documents, query)
+
+    async def distinct(self, field, query=None):
+        return await self._run(self.sync.distinct, field, query)
+
 # --- EXPORT VARIABLES ---
-print("✅ Using Local File Database (Fixed with Generated Images)")
-db = LocalFileDB()
-
-# Export Collections
-conversations_collection = db.conversations
-visual_memory_collection = db.visual_memories
-generated_images_collection = db.generated_images # 👈 Fixed Import Error
-users_collection = None
\ No newline at end of file
+if USE_LOCAL_DB:
+    if DB_BACKEND == "sqlite":
+        print(f"✅ Using SQLite Database ({SQLITE_PATH}, WAL)")
+        db = SQLiteDB()
+    else:
+        db = LocalFileDB()
+        print(f"✅ Using Local File Database (In-Memory + Append-Only Log, {db.filename})")
+
+    # Single writer thread: event loop kabhi disk pe block nahi hoga
+    db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="luna-db-io")
+    db_writer = WriteCoalescer(db, db_executor)
+
+    # Export Collections
+    conversations_collection = AsyncCollection(db.conversations, db_executor, db_writer)
+    visual_memory_collection = AsyncCollection(db.visual_memories, db_executor, db_writer)
+    generated_images_collection = AsyncCollection(db.generated_images, db_executor, db_writer) # 👈 Fixed Import Error
+    summaries_collection = AsyncCollection(db.conversation_summaries, db_executor, db_writer)
+else:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    print(f"✅ Using MongoDB via Motor ({DB_NAME})")
+    db = AsyncIOMotorClient(MONGO_URL)[DB_NAME]
+
+    # Motor collections already expose the same async API
+    conversations_collection = db.conversations
+    visual_memory_collection = db.visual_memories
+    generated_images_collection = db.generated_images
+    summaries_collection = db.conversation_summaries
+
+users_collection = None
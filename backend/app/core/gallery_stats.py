@@ -0,0 +1,115 @@
+"""
+Materialized per-user gallery statistics.
+
+Counts by mood, memory_type, tag and day, updated on every memory
+insert, so the stats endpoint never rescans the gallery. Each worker keeps
+them in memory (a PerUserIndex); a user's aggregates are recomputed only
+when the DB count disagrees (e.g. another worker inserted a memory).
+
+Rebuild everything from the store (and write the snapshot workers start from):
+
+    python -m app.core.gallery_stats
+"""
+import os
+import json
+import asyncio
+import datetime
+from collections import Counter
+
+from app.core.database import visual_memory_collection
+from app.core.vector_index import PerUserIndex
+
+GALLERY_STATS_PATH = os.getenv("LUNA_GALLERY_STATS_PATH", "gallery_stats.json")
+
+def _day(doc):
+    ts = doc.get("timestamp")
+    if isinstance(ts, datetime.datetime):
+        return ts.date().isoformat()
+    return str(ts)[:10] if ts else "unknown"
+
+class UserGalleryStats:
+    def __init__(self):
+        self.doc_count = 0
+        self.moods = Counter()
+        self.memory_types = Counter()
+        self.tags = Counter()
+        self.days = Counter()
+
+    @property
+    def total(self):
+        return self.doc_count
+
+    def apply(self, doc):
+        if doc.get("mood"):
+            self.moods[doc["mood"]] += 1
+        if doc.get("memory_type"):
+            self.memory_types[doc["memory_type"]] += 1
+        self.tags.update(set(str(t).lower() for t in doc.get("tags") or [] if t))
+        self.days[_day(doc)] += 1
+
+    def to_dict(self):
+        return {
+            "total": self.total,
+            "moods": dict(self.moods),
+            "memory_types": dict(self.memory_types),
+            "tags": dict(self.tags),
+            "days": dict(self.days),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.doc_count = data["total"]
+        stats.moods.update(data["moods"])
+        stats.memory_types.update(data["memory_types"])
+        stats.tags.update(data["tags"])
+        stats.days.update(data["days"])
+        return stats
+
+class GalleryStats(PerUserIndex):
+    def __init__(self, collection=visual_memory_collection, path=GALLERY_STATS_PATH):
+        super().__init__(collection)
+        self.path = path
+        self._users = None  # Pehli zaroorat pe snapshot se load
+
+    def user_map(self):
+        if self._users is None:
+            self._users = {}
+            try:
+                with open(self.path, "r") as f:
+                    self._users = {user_id: UserGalleryStats.from_dict(data) for user_id, data in json.load(f).items()}
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Gallery Stats: Could not load {self.path}: {e}")
+        return self._users
+
+    def new_index(self):
+        return UserGalleryStats()
+
+    def insert(self, index, doc):
+        index.apply(doc)
+
+    async def get(self, user_id):
+        # Count O(1) hai (Local DB per-user index / Mongo count), scan sirf mismatch pe
+        return await self._ensure(user_id)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({user_id: stats.to_dict() for user_id, stats in self.user_map().items()}, f)
+        os.replace(tmp_path, self.path)
+
+    async def rebuild_all(self):
+        """Recompute every user's aggregates from the store and save the snapshot."""
+        self._users = {}
+        for user_id in await self.collection.distinct("user_id"):
+            await self.rebuild(user_id)
+        await asyncio.to_thread(self.save)
+        return len(self._users)
+
+# Singleton Instance
+gallery_stats = GalleryStats()
+
+if __name__ == "__main__":
+    print(f"📊 Rebuilt gallery stats for {asyncio.run(gallery_stats.rebuild_all())} users")
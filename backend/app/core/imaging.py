@@ -0,0 +1,85 @@
+import io
+import os
+import base64
+import numpy as np
+from PIL import Image, ImageOps
+
+# --- Image preprocessing for the vision model ---
+# Model ko original file nahi, ek chhota re-encoded copy bhejte hain
+# (original disk pe waisa hi rehta hai). JPEG ke liye draft mode decoder ko
+# hi chhota decode karne bolta hai, isliye badi photo bhi poori memory mein
+# decode nahi hoti. Phone photos ka EXIF rotation pixels mein laga dete hain.
+
+MODEL_MAX_EDGE = int(os.getenv("LUNA_MODEL_MAX_EDGE", "1024"))
+MODEL_JPEG_QUALITY = int(os.getenv("LUNA_MODEL_JPEG_QUALITY", "85"))
+# JPEG ya WEBP
+MODEL_FORMAT = os.getenv("LUNA_MODEL_FORMAT", "JPEG").upper()
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+ORIENTATION_TAG = 0x0112  # EXIF Orientation
+
+# Per-worker counters (/api/metrics)
+preprocess_stats = {"images": 0, "original_bytes": 0, "model_bytes": 0, "passthrough": 0}
+
+def encode_for_model(path, max_edge=MODEL_MAX_EDGE, quality=MODEL_JPEG_QUALITY, fmt=MODEL_FORMAT):
+    """
+    Returns (bytes, mime): the image at `path` EXIF-oriented, longest edge
+    <= max_edge, re-encoded as `fmt`. If that comes out bigger than an
+    original that already fits, the original bytes are sent as-is.
+    """
+    with Image.open(path) as img:
+        source_format = img.format
+        source_size = img.size
+        rotated = img.getexif().get(ORIENTATION_TAG, 1) != 1
+        img.draft("RGB", (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format=fmt, quality=quality, optimize=True)
+        data = out.getvalue()
+
+    original_size = os.path.getsize(path)
+    preprocess_stats["images"] += 1
+    preprocess_stats["original_bytes"] += original_size
+    # Chhoti, pehle se compressed photo ko re-encode karke bada mat karo
+    if (len(data) >= original_size and source_format in MIME_TYPES and not rotated
+            and max(source_size) <= max_edge):
+        preprocess_stats["passthrough"] += 1
+        preprocess_stats["model_bytes"] += original_size
+        with open(path, "rb") as f:
+            return f.read(), MIME_TYPES[source_format]
+    preprocess_stats["model_bytes"] += len(data)
+    return data, MIME_TYPES.get(fmt, "image/jpeg")
+
+def model_base64(path, max_edge=MODEL_MAX_EDGE, quality=MODEL_JPEG_QUALITY, fmt=MODEL_FORMAT):
+    """Returns (base64 string, mime) of the preprocessed image."""
+    data, mime = encode_for_model(path, max_edge, quality, fmt)
+    return base64.b64encode(data).decode("ascii"), mime
+
+def get_preprocess_stats():
+    original = preprocess_stats["original_bytes"]
+    saved = original - preprocess_stats["model_bytes"]
+    return {
+        **preprocess_stats,
+        "saved_bytes": saved,
+        "saved_ratio": round(saved / original, 3) if original else 0.0,
+        "max_edge": MODEL_MAX_EDGE,
+        "format": MODEL_FORMAT,
+    }
+
+# --- Perceptual hash (dHash) ---
+# 9x8 grayscale, har pixel apne right neighbour se bright hai ya nahi = 64 bits.
+# Resize / recompress / halka edit hone pe bhi hash lagbhag same rehta hai.
+
+def perceptual_hash(path, hash_size=8):
+    """64-bit difference hash of the image at `path`, as a 16-char hex string."""
+    with Image.open(path) as img:
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming(a, b):
+    return (int(a, 16) ^ int(b, 16)).bit_count()
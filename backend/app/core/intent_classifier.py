@@ -0,0 +1,244 @@
+"""
+Local fast-path intent classifier (photo vs chat), CPU only.
+
+Do stage hain:
+  1. Keyword/regex rules: "dikhao", "send a pic of ...", "फोटो दिखाओ", "dikhau" etc.
+  2. Chhota multinomial Naive Bayes jo labeled history pe train hota hai
+     (user message ke baad Luna ne photo bheji = "photo", warna "chat").
+
+Jo cases `LUNA_INTENT_THRESHOLD` se zyada confident hain woh yahin resolve
+ho jaate hain; baaki ambiguous messages Gemini intent node pe jaate hain.
+
+Retrain + save by hand:
+
+    python -m app.core.intent_classifier
+"""
+import os
+import re
+import json
+import math
+import asyncio
+import unicodedata
+from collections import Counter
+
+from app.core.database import conversations_collection
+
+INTENT_THRESHOLD = float(os.getenv("LUNA_INTENT_THRESHOLD", "0.9"))
+INTENT_MODEL_PATH = os.getenv("LUNA_INTENT_MODEL", "intent_model.json")
+# Itne se kam labeled examples pe model pe bharosa nahi
+INTENT_MIN_SAMPLES = int(os.getenv("LUNA_INTENT_MIN_SAMPLES", "50"))
+# Training ke liye max kitne recent messages padhne hain
+INTENT_TRAIN_LIMIT = int(os.getenv("LUNA_INTENT_TRAIN_LIMIT", "5000"))
+
+TOKEN_RE = re.compile(r"[a-zऀ-ॿ']+")
+
+# Inme se kuch bhi na ho to photo ka sawal hi nahi (sirf Latin + Devanagari, dekho covered_script)
+PHOTO_VOCAB = re.compile(
+    r"\b(photo|photos|pic|pics|pik|picture|pictures|image|images|img|selfie|selfies|snap|click|"
+    r"tasveer|tasvir|foto|dikha\w*|show|bhej\w*|send|dekh\w*)\b"
+)
+# Devanagari: matras \w nahi hain, isliye \b kaam nahi karta -> script range se boundary.
+# Text NFC hota hai, jisme "फ़" = फ + nukta (\u093c)
+DEVANAGARI = "\u0900-\u097f"
+PHOTO_VOCAB_HI = re.compile(
+    rf"(?<![{DEVANAGARI}])(?:फ\u093c?ोटो|तस्वीर|तसवीर|सेल्फ\u093c?ी|पिक|इमेज|दिखा[{DEVANAGARI}]*|भेज[{DEVANAGARI}]*|देख[{DEVANAGARI}]*)(?![{DEVANAGARI}])"
+)
+# "Main dikhau / dikhata hu" = user khud dikhayega -> chat
+SELF_SHOW = re.compile(r"\b(dikhau|dikhaun|dikhaaun|dikhata|dikhati|i will show|let me show|i'?ll show)\b")
+# Seedhi request + photo noun + subject: "send a pic of the beach", "cat ki photo dikhao".
+# Photo noun zaroori hai: "show me how to cook pasta" photo request nahi hai
+SUBJECT_REQUEST = [
+    re.compile(r"\b(?:send|show)(?: me)?(?: a| an| your| ur)? (?:photo|pic|picture|image|selfie|snap) of (?:a |an |the |your |ur )?(?P<subject>.+)"),
+    re.compile(r"^(?P<subject>.+?) (?:ki|ka|ke) (?:photo|pic|picture|image|selfie|tasveer) (?:dikhao|bhejo|send karo|dikha do|bhej do)\b"),
+    re.compile(rf"^(?P<subject>.+?) (?:की|का|के) (?:फ\u093c?ोटो|तस्वीर|पिक|सेल्फ\u093c?ी) (?:दिखाओ|भेजो|दिखा दो|भेज दो)(?![{DEVANAGARI}])"),
+]
+
+def covered_script(text):
+    """True if every letter is Latin or Devanagari, the scripts PHOTO_VOCAB knows."""
+    return all(ch < "\u0250" or "\u0900" <= ch <= "\u097f" for ch in text if ch.isalpha())
+
+def tokenize(text):
+    words = TOKEN_RE.findall((text or "").lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+class NaiveBayesIntent:
+    """Multinomial Naive Bayes over unigrams + bigrams, with Laplace smoothing."""
+
+    labels = ("photo", "chat")
+
+    def __init__(self):
+        self.doc_counts = {label: 0 for label in self.labels}
+        self.token_counts = {label: Counter() for label in self.labels}
+        self.token_totals = {label: 0 for label in self.labels}
+        self.vocab = set()
+
+    @property
+    def samples(self):
+        return sum(self.doc_counts.values())
+
+    def fit(self, examples):
+        for text, label in examples:
+            tokens = tokenize(text)
+            self.doc_counts[label] += 1
+            self.token_counts[label].update(tokens)
+            self.token_totals[label] += len(tokens)
+            self.vocab.update(tokens)
+        return self
+
+    def predict(self, text):
+        """Returns (label, probability)."""
+        tokens = tokenize(text)
+        vocab_size = len(self.vocab) or 1
+        total_docs = self.samples
+        scores = {}
+        for label in self.labels:
+            score = math.log((self.doc_counts[label] + 1) / (total_docs + len(self.labels)))
+            denom = self.token_totals[label] + vocab_size
+            counts = self.token_counts[label]
+            for token in tokens:
+                score += math.log((counts[token] + 1) / denom)
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        # Softmax over log scores
+        top = scores[best]
+        norm = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self):
+        return {
+            "doc_counts": self.doc_counts,
+            "token_counts": {label: dict(counts) for label, counts in self.token_counts.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        model = cls()
+        model.doc_counts.update(data["doc_counts"])
+        for label, counts in data["token_counts"].items():
+            model.token_counts[label] = Counter(counts)
+            model.token_totals[label] = sum(counts.values())
+            model.vocab.update(counts)
+        return model
+
+class IntentClassifier:
+    def __init__(self, threshold=INTENT_THRESHOLD, model_path=INTENT_MODEL_PATH):
+        self.threshold = threshold
+        self.model_path = model_path
+        self.model = None
+        self.stats = {"total": 0, "rule_hits": 0, "model_hits": 0, "fallthrough": 0}
+        self.load()
+
+    # --- Rules ---
+
+    def _rules(self, text):
+        """Returns (intent, subject, confidence) or None."""
+        if not text:
+            return "chat", None, 1.0  # Sirf image bheji hai
+        if SELF_SHOW.search(text):
+            return "chat", None, 0.95
+        if not (PHOTO_VOCAB.search(text) or PHOTO_VOCAB_HI.search(text)):
+            # Dusri script (Bengali, Urdu...) mein photo words pata hi nahi -> LLM decide kare
+            return ("chat", None, 0.95) if covered_script(text) else None
+        for pattern in SUBJECT_REQUEST:
+            match = pattern.search(text)
+            if match:
+                subject = match.group("subject").strip(" ?!.")
+                if subject:
+                    return "photo", subject, 0.97
+        return None
+
+    def classify(self, message):
+        """
+        Resolve confident cases locally. Returns {"intent", "mood",
+        "photo_subject", "confidence", "source"} or None (ask the LLM).
+        A photo request without an explicit subject always falls through,
+        since the subject depends on what Luna said last.
+        """
+        self.stats["total"] += 1
+        text = unicodedata.normalize("NFC", " ".join((message or "").lower().split()))
+
+        result = self._rules(text)
+        source = "rules"
+        # Model bhi sirf inhi scripts ke tokens dekhta hai; baaki pe sirf prior bolega
+        if result is None and self.model is not None and covered_script(text):
+            label, prob = self.model.predict(text)
+            if label == "chat":
+                result, source = ("chat", None, prob), "model"
+
+        if result is None or result[2] < self.threshold:
+            self.stats["fallthrough"] += 1
+            return None
+
+        self.stats["rule_hits" if source == "rules" else "model_hits"] += 1
+        intent, subject, confidence = result
+        return {
+            "intent": intent,
+            "mood": "neutral",
+            "photo_subject": subject,
+            "confidence": round(confidence, 3),
+            "source": source,
+        }
+
+    def get_stats(self):
+        total = self.stats["total"]
+        hits = self.stats["rule_hits"] + self.stats["model_hits"]
+        return {
+            **self.stats,
+            "threshold": self.threshold,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "model_samples": self.model.samples if self.model else 0,
+        }
+
+    # --- Training ---
+
+    def load(self):
+        try:
+            with open(self.model_path, "r") as f:
+                self.model = NaiveBayesIntent.from_dict(json.load(f))
+            print(f"🧮 Intent: Loaded local model ({self.model.samples} samples)")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Intent: Could not load {self.model_path}: {e}")
+
+    def save(self):
+        tmp_path = self.model_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.model.to_dict(), f)
+        os.replace(tmp_path, self.model_path)
+
+    async def train_from_history(self, limit=INTENT_TRAIN_LIMIT, save=True):
+        """
+        Label recent user messages from conversation history: if Luna's
+        reply in the same turn carried a photo, it was a photo request.
+        """
+        docs = await conversations_collection.find({}).sort("timestamp", -1).to_list(limit)
+
+        # Ek turn ke user + assistant messages ka timestamp same hota hai
+        photo_turns = {
+            (doc.get("user_id"), str(doc.get("timestamp")))
+            for doc in docs
+            if doc.get("role") == "assistant" and doc.get("photo_sent")
+        }
+        examples = [
+            (doc.get("content") or "", "photo" if (doc.get("user_id"), str(doc.get("timestamp"))) in photo_turns else "chat")
+            for doc in docs
+            if doc.get("role") == "user" and doc.get("content")
+        ]
+
+        labels = Counter(label for _, label in examples)
+        if len(examples) < INTENT_MIN_SAMPLES or min(labels["photo"], labels["chat"]) < 5:
+            print(f"🧮 Intent: Not enough labeled history to train ({dict(labels)})")
+            return None
+
+        self.model = NaiveBayesIntent().fit(examples)
+        if save:
+            await asyncio.to_thread(self.save)
+        print(f"🧮 Intent: Trained local model on {dict(labels)}")
+        return self.model
+
+# Singleton Instance
+intent_classifier = IntentClassifier()
+
+if __name__ == "__main__":
+    asyncio.run(intent_classifier.train_from_history())
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+# --- Response cache for near-deterministic LLM prompts ---
+# Key = normalized prompt + model + temperature. Pehle in-memory LRU (TTL ke
+# saath), phir optional SQLite tier jo restarts aur workers ke beech share hota hai.
+
+LLM_CACHE_SIZE = int(os.getenv("LUNA_LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LUNA_LLM_CACHE_TTL", "86400"))
+# Khaali = persistent tier off
+LLM_CACHE_PATH = os.getenv("LUNA_LLM_CACHE_PATH", "")
+
+def normalize_prompt(prompt):
+    # Extra spaces / indentation / case se alag key nahi banni chahiye
+    return " ".join(str(prompt).split()).casefold()
+
+class LLMCache:
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL_SECONDS, path=LLM_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def key(prompt, model, temperature=None):
+        raw = json.dumps([model, temperature, normalize_prompt(prompt)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- Persistent tier (SQLite) ---
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key):
+        row = self._conn().execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def _disk_set(self, key, value, expires_at):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, value, expires_at))
+
+    # --- Public API (sync; disk tier ke liye caller thread mein chalata hai) ---
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] >= now:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self.stats["expired"] += 1
+
+        if self.path:
+            row = self._disk_get(key)
+            if row is not None:
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+
+        self.stats["misses"] += 1
+        return None
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (ttl or self.ttl)
+        self._remember(key, value, expires_at)
+        if self.path:
+            self._disk_set(key, value, expires_at)
+
+    def get_stats(self):
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "persistent": bool(self.path),
+        }
+
+# Singleton Instance
+llm_cache = LLMCache()
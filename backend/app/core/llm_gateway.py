@@ -0,0 +1,196 @@
+import os
+import json
+import asyncio
+from google import genai
+from dotenv import load_dotenv
+from app.core.llm_cache import llm_cache
+
+load_dotenv()
+
+# --- Shared async gateway for every Gemini call ---
+# Ek hi client, ek hi concurrency limit. Sync `client.models.generate_content`
+# event loop ko block karta tha, ab sab `client.aio` se jaata hai.
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+# Ek worker se ek saath kitni Gemini calls chal sakti hain
+LLM_MAX_CONCURRENCY = int(os.getenv("LUNA_LLM_CONCURRENCY", "8"))
+# Ek call ka max time (seconds), queue mein wait ko chhod ke
+LLM_TIMEOUT_SECONDS = float(os.getenv("LUNA_LLM_TIMEOUT", "30"))
+EMBED_MODEL = os.getenv("LUNA_EMBED_MODEL", "text-embedding-004")
+EMBED_DIM = int(os.getenv("LUNA_EMBED_DIM", "256"))
+# Gemini batch embed ek request mein max 100 texts leta hai
+EMBED_BATCH_SIZE = 100
+
+class LLMGateway:
+    """Bounded, timeout-aware access to Gemini for async code paths."""
+
+    def __init__(self, api_key=None, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT_SECONDS):
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self.cache = llm_cache
+        self.stats = {"calls": 0, "in_flight": 0, "timeouts": 0, "errors": 0, "cancelled": 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    async def run(self, awaitable, timeout=None):
+        """
+        Await any LLM coroutine (e.g. a LangChain `ainvoke`) under the shared
+        concurrency limit and timeout. Cancelling the caller cancels the call.
+        """
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            # Queue mein hi cancel ho gaya, coroutine kabhi start nahi hua
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            self.stats["cancelled"] += 1
+            raise
+
+        try:
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            try:
+                return await asyncio.wait_for(awaitable, timeout or self.timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                print(f"⏱️ LLM Gateway: call timed out after {timeout or self.timeout}s")
+                raise
+            except asyncio.CancelledError:
+                self.stats["cancelled"] += 1
+                raise
+            except Exception:
+                self.stats["errors"] += 1
+                raise
+            finally:
+                self.stats["in_flight"] -= 1
+        finally:
+            self._semaphore.release()
+
+    async def stream(self, chunks, timeout=None):
+        """
+        Iterate an LLM stream (e.g. a LangChain `astream`) under the shared
+        concurrency limit. The timeout applies to the first chunk and to each
+        gap between chunks, not to the whole stream, so a long reply that keeps
+        flowing is never cut off halfway. Use with contextlib.aclosing().
+        """
+        limit = timeout or self.timeout
+        iterator = chunks.__aiter__()
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            await _close(iterator)
+            self.stats["cancelled"] += 1
+            raise
+
+        try:
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            while True:
+                try:
+                    # Har chunk ka intezaar max `limit` seconds (pehla chunk bhi)
+                    chunk = await asyncio.wait_for(iterator.__anext__(), limit)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self.stats["timeouts"] += 1
+                    print(f"⏱️ LLM Gateway: stream stalled for {limit}s")
+                    raise
+                except asyncio.CancelledError:
+                    self.stats["cancelled"] += 1
+                    raise
+                except Exception:
+                    self.stats["errors"] += 1
+                    raise
+                yield chunk
+        finally:
+            self.stats["in_flight"] -= 1
+            self._semaphore.release()
+            await _close(iterator)
+
+    async def cached(self, prompt, model, temperature, compute, ttl=None):
+        """
+        Return the cached response for (prompt, model, temperature), or await
+        `compute()` and cache its result. Empty results are never cached.
+        """
+        key = self.cache.key(prompt, model, temperature)
+        value = await self._cache_op(self.cache.get, key)
+        if value is not None:
+            return value
+
+        value = await compute()
+        if value:
+            await self._cache_op(self.cache.set, key, value, ttl)
+        return value
+
+    async def _cache_op(self, fn, *args):
+        # SQLite tier on ho to disk I/O thread mein, warna seedha memory se
+        if self.cache.path:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def generate(self, contents, model=DEFAULT_MODEL, timeout=None, temperature=None, cache=False, cache_ttl=None) -> str:
+        """
+        Single Gemini round-trip, returns the stripped response text.
+        With `cache=True` repeated prompts are answered from the response cache.
+        """
+        config = {"temperature": temperature} if temperature is not None else None
+
+        async def call():
+            response = await self.run(
+                self.client.aio.models.generate_content(model=model, contents=contents, config=config),
+                timeout=timeout
+            )
+            return (response.text or "").strip()
+
+        if cache:
+            return await self.cached(contents, model, temperature, call, ttl=cache_ttl)
+        return await call()
+
+    async def embed(self, texts, model=EMBED_MODEL, dim=EMBED_DIM, timeout=None):
+        """
+        Embed a list of texts (one vector per text), EMBED_BATCH_SIZE per
+        request. Each text is cached separately as soon as its batch succeeds.
+        """
+        vectors = [None] * len(texts)
+        keys = [self.cache.key(text, model, f"embed:{dim}") for text in texts]
+        missing = []
+        for i, key in enumerate(keys):
+            hit = await self._cache_op(self.cache.get, key)
+            if hit is not None:
+                vectors[i] = json.loads(hit)
+            else:
+                missing.append(i)
+
+        for start in range(0, len(missing), EMBED_BATCH_SIZE):
+            batch = missing[start:start + EMBED_BATCH_SIZE]
+            response = await self.run(
+                self.client.aio.models.embed_content(
+                    model=model,
+                    contents=[texts[i] for i in batch],
+                    config={"output_dimensionality": dim}
+                ),
+                timeout=timeout
+            )
+            # Fail hua to pichle batches cache mein hain, retry sirf baaki ka
+            for i, embedding in zip(batch, response.embeddings):
+                vectors[i] = list(embedding.values)
+                await self._cache_op(self.cache.set, keys[i], json.dumps(vectors[i]))
+        return vectors
+
+async def _close(iterator):
+    # Beech mein chhoda hua stream band karo (HTTP connection free ho jaye)
+    aclose = getattr(iterator, "aclose", None)
+    if aclose is not None:
+        try:
+            await aclose()
+        except Exception:
+            pass
+
+# Singleton Instance
+llm_gateway = LLMGateway()
@@ -0,0 +1,86 @@
+"""
+Migrate the local file DB to another on-disk format.
+
+Stop the server first, then run from the backend directory:
+
+    python -m app.core.migrate_db --to msgpack --compress zstd
+    python -m app.core.migrate_db --source luna_memory.json --to orjson
+
+The source snapshot is loaded and its log replayed, legacy string
+timestamps are converted to real datetimes, and the result is written as
+a fresh snapshot (plus an empty log) in the target format. The source
+files are left untouched as a backup.
+"""
+import os
+import argparse
+import datetime
+
+from app.core.database import LocalFileDB
+from app.core.serializers import SERIALIZERS, get_serializer
+
+DATE_FIELDS = ("timestamp",)
+
+def _typed(doc):
+    # Purane data mein timestamp ISO string hai -> datetime bana do
+    for field in DATE_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                doc = {**doc, field: datetime.datetime.fromisoformat(value)}
+            except ValueError:
+                pass
+    return doc
+
+def migrate(source, source_format="json", target_format="msgpack", compress=None, target=None):
+    src_serializer = get_serializer(source_format)
+    dst_serializer = get_serializer(target_format, compress)
+
+    src = LocalFileDB(source, serializer=src_serializer)
+    try:
+        with src._process_lock():
+            src._catch_up()
+            with src._lock:
+                seq = src._seq
+                snapshot = {name: [_typed(doc) for doc in rows.values()] for name, rows in src._data.items()}
+    finally:
+        src.close()
+
+    if target is None:
+        base = source[:-len(src_serializer.extension)] if source.endswith(src_serializer.extension) else os.path.splitext(source)[0]
+        target = base + dst_serializer.extension
+    if os.path.abspath(target) == os.path.abspath(source):
+        raise ValueError("Target is the same file as the source; pass --target")
+
+    target_base = target[:-len(dst_serializer.extension)] if target.endswith(dst_serializer.extension) else os.path.splitext(target)[0]
+    target_log = target_base + dst_serializer.log_suffix
+
+    snapshot["_meta"] = {"seq": seq}
+    for path, payload in (
+        (target, dst_serializer.dumps_snapshot(snapshot)),
+        (target_log, dst_serializer.frame({"op": "base", "seq": seq})),
+    ):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    counts = {name: len(rows) for name, rows in snapshot.items() if name != "_meta"}
+    before = os.path.getsize(source)
+    after = os.path.getsize(target)
+    print(f"✅ Migrated {counts} -> {target}")
+    print(f"📦 Snapshot size: {before:,} -> {after:,} bytes")
+    return target
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate luna_memory to another on-disk format")
+    parser.add_argument("--source", default="luna_memory.json")
+    parser.add_argument("--source-format", default="json", choices=sorted(SERIALIZERS))
+    parser.add_argument("--to", dest="target_format", default="msgpack", choices=sorted(SERIALIZERS))
+    parser.add_argument("--compress", default=None, choices=["zstd", "none"])
+    parser.add_argument("--target", default=None, help="Output snapshot path (default: derived from --to)")
+    args = parser.parse_args()
+
+    migrate(args.source, args.source_format, args.target_format, args.compress, args.target)
+    print("👉 Set LUNA_DB_FORMAT / LUNA_DB_COMPRESS to match before starting the server")
@@ -0,0 +1,84 @@
+import os
+
+from app.core.imaging import hamming
+from app.core.vector_index import PerUserIndex, UserIndex
+
+# --- Near-duplicate detection for visual memories ---
+# Har user ka ek BK-tree (perceptual hash -> memory). Hamming distance
+# metric hai, isliye search mein poora gallery scan nahi hota, sirf woh
+# branches jo triangle inequality se radius ke andar aa sakti hain.
+
+# Itne bits tak ka farak = same photo (resize / recompress / burst shot)
+PHASH_RADIUS = int(os.getenv("LUNA_PHASH_RADIUS", "6"))
+# Isse kam set (ya unset) bits wala hash = flat image, near-duplicate check nahi
+PHASH_MIN_BITS = int(os.getenv("LUNA_PHASH_MIN_BITS", "8"))
+
+class BKTree:
+    def __init__(self):
+        self.root = None  # [hash, payload, {distance: child}]
+        self.size = 0
+
+    def add(self, value, payload):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, payload, {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, payload, {}]
+                return
+            node = child
+
+    def search(self, value, radius):
+        """All (distance, payload) within `radius`, closest first."""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                results.append((distance, node[1]))
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        results.sort(key=lambda item: item[0])
+        return results
+
+def is_informative(phash, min_bits=PHASH_MIN_BITS):
+    """
+    Flat / uniform images (blank, dark, smooth gradient) hash to almost all
+    0s or all 1s, so unrelated ones look like near-duplicates. Such hashes
+    are never indexed or looked up.
+    """
+    ones = int(phash, 16).bit_count()
+    return min(ones, len(phash) * 4 - ones) >= min_bits
+
+class UserHashes(UserIndex):
+    def __init__(self):
+        super().__init__()
+        self.tree = BKTree()  # payload = memory id
+
+class PerceptualIndex(PerUserIndex):
+    def new_index(self):
+        return UserHashes()
+
+    def insert(self, index, doc):
+        if doc.get("phash") and is_informative(doc["phash"]):
+            index.tree.add(doc["phash"], doc["_id"])
+
+    async def find_near_duplicate(self, user_id, phash, radius=PHASH_RADIUS):
+        """Closest existing memory within `radius` bits as (distance, doc), or None."""
+        if not is_informative(phash):
+            return None
+        index = await self._ensure(user_id)
+        for distance, memory_id in index.tree.search(phash, radius):
+            docs = await self.load(user_id, [memory_id])
+            if docs:
+                return distance, docs[0]
+        return None
+
+# Singleton Instance
+phash_index = PerceptualIndex()
@@ -2,12 +2,13 @@ import os
 import random
 import asyncio
 import urllib.parse
-from google import genai
+from app.core.llm_gateway import llm_gateway
 
 # --- 1. SETUP GEMINI (For Smart Captions) ---
 # Ensure GEMINI_API_KEY is set in your environment variables
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 model_name = 'gemini-2.5-flash'
+# Caption chhota hai, iske liye zyada wait nahi karna
+CAPTION_TIMEOUT_SECONDS = float(os.getenv("LUNA_CAPTION_TIMEOUT", "10"))
 
 async def generate_smart_caption(prompt: str, mood: str) -> str:
     """
@@ -25,11 +26,7 @@ async def generate_smart_caption(prompt: str, mood: str) -> str:
         - Keep it under 10 words. Don't be generic.
         """
         
-        response = client.models.generate_content(
-            model=model_name,
-            contents=caption_prompt
-        )
-        return response.text.strip()
+        return await llm_gateway.generate(caption_prompt, model=model_name, timeout=CAPTION_TIMEOUT_SECONDS, cache=True)
     except Exception as e:
         return "Ye lo! ✨"
 async def select_companion_photo(mood: str, prompt: str = None) -> dict:
@@ -0,0 +1,171 @@
+import os
+from collections import OrderedDict
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+
+from app.core.personality import LUNA_SYSTEM_PROMPT
+
+# --- Token-budgeted prompt assembly ---
+# Persona har naam ke liye ek baar compile (placeholders bhar ke) aur cache.
+# Har turn: persona + current message fixed, phir summary, recent history
+# (naye se purane) aur visual memories budget ke andar jitne fit hon.
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("LUNA_PROMPT_TOKEN_BUDGET", "4000"))
+# Summary isse zyada jagah nahi le sakti
+SUMMARY_TOKEN_CAP = int(os.getenv("LUNA_SUMMARY_TOKEN_CAP", "400"))
+AI_NAME = os.getenv("LUNA_AI_NAME", "Luna")
+DEFAULT_USER_NAME = os.getenv("LUNA_USER_NAME", "the user")
+PERSONA_CACHE_SIZE = 1024
+
+# Approx tokens per character by script (Gemini tokenizer jaisa, thoda upar ki taraf).
+# Romanized Hinglish English se zyada tokens leta hai, isliye ASCII 3 chars/token;
+# Devanagari (matras samet) ~1 token per character, emoji 2+.
+ASCII_TOKEN_COST = 1 / 3
+DEVANAGARI_TOKEN_COST = 1.0
+EMOJI_TOKEN_COST = 2.0
+OTHER_TOKEN_COST = 1.0
+
+def _char_cost(ch):
+    code = ord(ch)
+    if code < 128:
+        return ASCII_TOKEN_COST
+    if 0x0900 <= code <= 0x097F:
+        return DEVANAGARI_TOKEN_COST
+    if code >= 0x1F000:
+        return EMOJI_TOKEN_COST
+    return OTHER_TOKEN_COST
+
+def estimate_tokens(text):
+    """Cheap, script-aware token estimate without a tokenizer (errs on the high side)."""
+    return int(sum(_char_cost(ch) for ch in text or "")) + 1
+
+def _truncate(text, max_tokens):
+    # Same per-character costs as estimate_tokens, taaki kata hua text cap ke andar hi rahe
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    suffix = " …"
+    used = 1 + sum(_char_cost(ch) for ch in suffix)
+    end = 0
+    for ch in text:
+        used += _char_cost(ch)
+        if used >= max_tokens:
+            break
+        end += 1
+    cut = text[:end]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut + suffix
+
+class PromptBuilder:
+    def __init__(self, template=LUNA_SYSTEM_PROMPT, budget=PROMPT_TOKEN_BUDGET):
+        self.template = template
+        self.budget = budget
+        self._personas = OrderedDict()  # resolved user_name -> (text, tokens)
+        self.stats = {"turns": 0, "total_tokens": 0, "history_dropped": 0, "memories_dropped": 0, "summary_truncated": 0}
+
+    def persona(self, user_name=None):
+        """
+        Compiled persona as (text, tokens): placeholders resolved once per
+        name, then served from an LRU. Users without a name share one entry.
+        """
+        name = user_name or DEFAULT_USER_NAME
+        cached = self._personas.get(name)
+        if cached is not None:
+            self._personas.move_to_end(name)
+            return cached
+
+        # str.format nahi: template mein aur bhi curly braces ho sakte hain
+        text = (self.template
+                .replace("{ai_name}", AI_NAME)
+                .replace("{luna}", AI_NAME)
+                .replace("{user_name}", name))
+        cached = self._personas[name] = (text, estimate_tokens(text))
+        if len(self._personas) > PERSONA_CACHE_SIZE:
+            self._personas.popitem(last=False)
+        return cached
+
+    def build(self, user_id, user_message, history=(), summary="", memories=(), image_analysis=None, user_name=None):
+        """
+        Returns (messages, breakdown). `history` is oldest-first message docs,
+        `memories` are short visual-memory notes, newest first.
+        """
+        history, memories = list(history), list(memories)
+        persona_text, persona_tokens = self.persona(user_name)
+
+        current = user_message or ""
+        if image_analysis:
+            current += f"\n[Image Context: {image_analysis.get('description', '')}]"
+        message_tokens = estimate_tokens(current)
+        remaining = self.budget - persona_tokens - message_tokens
+
+        # 1. Summary (cap ke saath)
+        summary_block = ""
+        header = "\n\n**Earlier in this conversation (summary):**\n"
+        # Header bhi budget mein ginta hai
+        cap = min(SUMMARY_TOKEN_CAP, remaining) - estimate_tokens(header)
+        if summary and cap > 0:
+            trimmed = _truncate(summary, cap)
+            if trimmed != summary:
+                self.stats["summary_truncated"] += 1
+            summary_block = f"{header}{trimmed}\n"
+        summary_tokens = estimate_tokens(summary_block) if summary_block else 0
+        remaining -= summary_tokens
+
+        # 2. Recent history, naye se purane; jo fit na ho woh chhod do
+        kept = []
+        history_tokens = 0
+        for doc in reversed(history):
+            cost = estimate_tokens(doc.get("content", ""))
+            if cost > remaining - history_tokens:
+                break
+            history_tokens += cost
+            kept.append(doc)
+        kept.reverse()
+        remaining -= history_tokens
+
+        # 3. Visual memories (sabse kam zaroori)
+        memory_lines = []
+        memory_tokens = 0
+        for note in memories:
+            line = f"- {note}\n"
+            cost = estimate_tokens(line)
+            if cost > remaining - memory_tokens:
+                break
+            memory_tokens += cost
+            memory_lines.append(line)
+        memory_block = "\n\n**Visual Memories:**\n" + "".join(memory_lines) if memory_lines else ""
+
+        messages = [SystemMessage(content=persona_text + summary_block + memory_block)]
+        for doc in kept:
+            content = doc.get("content", "")
+            messages.append(HumanMessage(content=content) if doc.get("role") == "user" else AIMessage(content=content))
+        messages.append(HumanMessage(content=current))
+
+        breakdown = {
+            "persona": persona_tokens,
+            "summary": summary_tokens,
+            "memories": memory_tokens,
+            "history": history_tokens,
+            "message": message_tokens,
+            "total": persona_tokens + summary_tokens + memory_tokens + history_tokens + message_tokens,
+            "budget": self.budget,
+            "history_kept": len(kept),
+            "history_dropped": len(history) - len(kept),
+            "memories_dropped": len(memories) - len(memory_lines),
+        }
+        self.stats["turns"] += 1
+        self.stats["total_tokens"] += breakdown["total"]
+        self.stats["history_dropped"] += breakdown["history_dropped"]
+        self.stats["memories_dropped"] += breakdown["memories_dropped"]
+        return messages, breakdown
+
+    def get_stats(self):
+        turns = self.stats["turns"]
+        return {
+            **self.stats,
+            "budget": self.budget,
+            "avg_prompt_tokens": round(self.stats["total_tokens"] / turns, 1) if turns else 0.0,
+            "personas_cached": len(self._personas),
+        }
+
+# Singleton Instance
+prompt_builder = PromptBuilder()
@@ -1,27 +1,39 @@
-from google import genai
-from google.genai import types
 import os
+import asyncio
 from dotenv import load_dotenv
 
 from app.core.database import visual_memory_collection
+from app.core.llm_gateway import llm_gateway
+from app.core.vector_index import visual_index
+from app.core.search_index import gallery_index
+from app.core.gallery_stats import gallery_stats
+from app.core.phash_index import phash_index
+from app.core.uploads import content_store
 from datetime import datetime
 
 load_dotenv()
 
+# Vector search se kitne candidates nikalne hain
+RAG_TOP_K = int(os.getenv("LUNA_RAG_TOP_K", "5"))
+# Isse kam cosine similarity = match hi nahi
+RAG_MIN_SCORE = float(os.getenv("LUNA_RAG_MIN_SCORE", "0.35"))
+# Top candidates pe Gemini se final choice (off = seedha best vector match)
+RAG_RERANK = os.getenv("LUNA_RAG_RERANK", "1") == "1"
+# Embeddings na milein to Gemini ko max itni memories dikhani hain
+RAG_FALLBACK_LIMIT = int(os.getenv("LUNA_RAG_FALLBACK_LIMIT", "50"))
+
 # Configure Gemini
 api_key = os.getenv("GEMINI_API_KEY")
 if not api_key:
     raise ValueError("GEMINI_API_KEY not found in .env")
 
-client = genai.Client(api_key=api_key)
-
 class GenerativeRAG:
     def __init__(self):
-        self.client = client
+        self.llm = llm_gateway
         # ✅ Using stable model to prevent quota/version errors
         self.model_name = 'gemini-2.5-flash' 
 
-    async def memorize_image(self, user_id: str, image_url: str, description: str, analysis: dict):
+    async def memorize_image(self, user_id: str, image_url: str, description: str, analysis: dict, phash: str = None):
         """
         Save image memory to database with full analysis.
         """
@@ -36,29 +48,61 @@ class GenerativeRAG:
             "mood": analysis.get('mood', 'neutral'),
             "colors": analysis.get('colors', []),
             "tags": analysis.get('tags', []),
+            "phash": phash,
             "timestamp": datetime.utcnow()
         }
         
-        # 👇 FIX 1: Removed 'await' (Local DB is synchronous)
-        visual_memory_collection.insert_one(memory_doc)
+        await self.store_memory(memory_doc)
         print("✅ RAG: Image memorized successfully.")
 
+    async def store_memory(self, doc: dict):
+        """
+        Single write path for visual memories: embed, insert, then update
+        this worker's vector / search / stats / perceptual-hash indexes.
+        """
+        embedding = await visual_index.embed_doc(doc)
+        if embedding:
+            doc["embedding"] = embedding
+
+        # Async insert (DB I/O thread pe chalta hai)
+        await visual_memory_collection.insert_one(doc)
+        if doc.get("image_url"):
+            # Upload store ko batao: yeh file ab ek memory ki hai
+            await asyncio.to_thread(content_store.retain, doc["image_url"])
+        visual_index.add(doc["user_id"], doc)
+        gallery_index.add(doc["user_id"], doc)
+        gallery_stats.add(doc["user_id"], doc)
+        phash_index.add(doc["user_id"], doc)
+
     async def retrieve_image(self, user_id: str, query: str):
         """
-        Generative Search: Use Gemini to find the best matching image.
+        Vector search: top-k memories by embedding similarity, then an
+        optional Gemini rerank over just those few candidates.
         """
         print(f"🔍 RAG: Searching for '{query}'...")
 
-        # 1. Get all memories for this user
-        # 👇 FIX 2: Removed 'await' and '.to_list()'
-        # Local DB cursor is already a list-like object
-        cursor = visual_memory_collection.find({"user_id": user_id})
-        memories = list(cursor)
-        
+        candidates = await visual_index.search(user_id, query, k=RAG_TOP_K)
+        if candidates is None:
+            # Embeddings available nahi: purana tareeka, par sirf recent memories pe
+            memories = await visual_memory_collection.find({"user_id": user_id}).sort("timestamp", -1).to_list(RAG_FALLBACK_LIMIT)
+        else:
+            memories = [doc for score, doc in candidates if score >= RAG_MIN_SCORE]
+            print(f"🧭 RAG Candidates: {[round(score, 3) for score, _ in candidates]}")
+
         if not memories:
             return None
 
-        # 2. Prepare context for Gemini
+        if candidates is not None and not RAG_RERANK:
+            return self._image_of(memories[0])
+        return await self._llm_select(query, memories)
+
+    @staticmethod
+    def _image_of(memory):
+        # Return URL or Path depending on what's stored
+        return memory.get('image_url') or memory.get('image_path')
+
+    async def _llm_select(self, query: str, memories: list):
+        # Prepare context for Gemini
         memory_text = ""
         for i, mem in enumerate(memories):
             desc = mem.get('description', 'Unknown')
@@ -66,7 +110,7 @@ class GenerativeRAG:
             mood = mem.get('mood', '')
             memory_text += f"ID: {i} | Description: {desc} | Objects: {objects} | Mood: {mood}\n"
 
-        # 3. The "Selector" Prompt
+        # The "Selector" Prompt
         prompt = f"""
 User Query: "{query}"
 
@@ -79,21 +123,15 @@ Return ONLY the ID number (e.g., '2').
 """
 
         try:
-            # Using synchronous client call inside async wrapper is fine here
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
-            result = response.text.strip()
+            # Async gateway: event loop block nahi hota
+            result = await self.llm.generate(prompt, model=self.model_name)
             
             print(f"🤖 RAG Decision: {result}")
 
             if result.isdigit():
                 idx = int(result)
                 if 0 <= idx < len(memories):
-                    found_memory = memories[idx]
-                    # Return URL or Path depending on what's stored
-                    return found_memory.get('image_url') or found_memory.get('image_path')
+                    return self._image_of(memories[idx])
         except Exception as e:
             print(f"⚠️ RAG Error: {e}")
         
@@ -0,0 +1,139 @@
+import re
+import math
+import bisect
+import datetime
+from collections import defaultdict
+
+from app.core.vector_index import PerUserIndex, UserIndex
+
+# --- Inverted full-text index for gallery search ---
+# Har user ka apna index: term -> {doc position: weighted term frequency};
+# position -> memory id, docs sirf top results ke liye DB se aate hain.
+# Vocabulary sorted rehti hai, isliye prefix match = bisect range.
+# Insert pe update hota hai; dusre worker ne insert kiya to count se pata chal jaata hai.
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Tags/objects description ke ek-do shabdon se zyada matlab rakhte hain
+FIELD_WEIGHTS = {"description": 1.0, "scene": 1.0, "mood": 1.5, "tags": 2.0, "objects": 2.0}
+# Prefix match ("cat" -> "caterpillar") exact se kam score paata hai
+PREFIX_PENALTY = 0.5
+# Recency boost: 30 din purani memory ko aadha boost
+RECENCY_HALF_LIFE_DAYS = 30.0
+RECENCY_WEIGHT = 1.0
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+def _doc_terms(doc):
+    terms = defaultdict(float)
+    for field, weight in FIELD_WEIGHTS.items():
+        value = doc.get(field)
+        if not value:
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            for token in tokenize(item):
+                terms[token] += weight
+    return terms
+
+def _age_days(ts, now):
+    if isinstance(ts, str):
+        try:
+            ts = datetime.datetime.fromisoformat(ts)
+        except ValueError:
+            return None
+    if not isinstance(ts, datetime.datetime):
+        return None
+    return max((now - ts.replace(tzinfo=None)).total_seconds() / 86400, 0.0)
+
+def parse_query(query):
+    """
+    "cat dog" -> [["cat", "dog"]] (AND); "cat OR dog" / "cat | dog" -> [["cat"], ["dog"]].
+    Result is a list of AND-groups that are OR-ed together.
+    """
+    groups, current = [], []
+    for word in re.split(r"\s+", query.replace("|", " OR ").strip()):
+        if word == "OR":
+            if current:
+                groups.append(current)
+            current = []
+        else:
+            current += tokenize(word)
+    if current:
+        groups.append(current)
+    return groups
+
+class UserTextIndex(UserIndex):
+    def __init__(self):
+        super().__init__()
+        self.timestamps = []  # Position -> timestamp (recency boost ke liye)
+        self.postings = {}    # term -> {doc position: weight}
+        self.vocab = []       # sorted terms (prefix lookup)
+
+    def add(self, doc):
+        position = len(self.ids)
+        self.ids.append(doc["_id"])
+        self.timestamps.append(doc.get("timestamp"))
+        for term, weight in _doc_terms(doc).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                bisect.insort(self.vocab, term)
+            posting[position] = weight
+
+    def match_term(self, term):
+        """Doc position -> score for one query term, exact or as a prefix."""
+        scores = {}
+        start = bisect.bisect_left(self.vocab, term)
+        for i in range(start, len(self.vocab)):
+            candidate = self.vocab[i]
+            if not candidate.startswith(term):
+                break
+            factor = 1.0 if candidate == term else PREFIX_PENALTY
+            for position, weight in self.postings[candidate].items():
+                scores[position] = max(scores.get(position, 0.0), weight * factor)
+        return scores
+
+    def search(self, groups):
+        results = {}
+        for group in groups:
+            # AND: sabse chhoti posting list se shuru, baaki se intersect
+            matches = sorted((self.match_term(term) for term in group), key=len)
+            if not matches or not matches[0]:
+                continue
+            combined = dict(matches[0])
+            for other in matches[1:]:
+                combined = {pos: score + other[pos] for pos, score in combined.items() if pos in other}
+                if not combined:
+                    break
+            for position, score in combined.items():
+                results[position] = max(results.get(position, 0.0), score)
+        return results
+
+class GallerySearchIndex(PerUserIndex):
+    def new_index(self):
+        return UserTextIndex()
+
+    def insert(self, index, doc):
+        index.add(doc)
+
+    async def search(self, user_id, query, limit=100):
+        """Ranked memories for a query: term-frequency score plus a recency boost."""
+        groups = parse_query(query)
+        if not groups:
+            return []
+        index = await self._ensure(user_id)
+        matches = index.search(groups)
+
+        now = datetime.datetime.utcnow()
+        ranked = []
+        for position, score in matches.items():
+            age = _age_days(index.timestamps[position], now)
+            if age is not None:
+                score += RECENCY_WEIGHT * math.pow(0.5, age / RECENCY_HALF_LIFE_DAYS)
+            ranked.append((score, position))
+        # Barabar score pe naya pehle
+        ranked.sort(reverse=True)
+        return await self.load(user_id, [index.ids[position] for _, position in ranked[:limit]])
+
+# Singleton Instance
+gallery_index = GallerySearchIndex()
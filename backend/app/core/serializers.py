@@ -0,0 +1,181 @@
+import json
+import struct
+import datetime
+
+# --- Pluggable serializers for LocalFileDB ---
+# Snapshot = ek bada blob (optional zstd), log = chhote records ki stream.
+# Datetimes typed rehte hain: JSON mein {"$date": iso} tag, msgpack mein ext type.
+
+DATE_TAG = "$date"
+MSGPACK_DATETIME_EXT = 1
+
+def _untag(obj):
+    # {"$date": "..."} -> datetime (nested dicts/lists bhi)
+    if isinstance(obj, dict):
+        if len(obj) == 1 and DATE_TAG in obj:
+            return datetime.datetime.fromisoformat(obj[DATE_TAG])
+        return {k: _untag(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_untag(v) for v in obj]
+    return obj
+
+def _json_default(obj):
+    if isinstance(obj, datetime.datetime):
+        return {DATE_TAG: obj.isoformat()}
+    return str(obj)
+
+class Serializer:
+    """Base: snapshots use the same encoding as records unless a subclass compresses."""
+
+    def dumps_snapshot(self, obj):
+        return self.dumps(obj)
+
+    def loads_snapshot(self, raw):
+        return self.loads(raw)
+
+class JSONSerializer(Serializer):
+    """Stdlib JSON. Same on-disk format as the original luna_memory.json."""
+
+    name = "json"
+    extension = ".json"
+    log_suffix = ".log"
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=_json_default).encode("utf-8")
+
+    def loads(self, raw):
+        obj = json.loads(raw)
+        # Tag dhundhna walk se sasta hai; legacy files mein hota hi nahi
+        return _untag(obj) if b'"' + DATE_TAG.encode() + b'"' in raw else obj
+
+    # Log framing: ek record = ek line
+    def frame(self, obj):
+        return self.dumps(obj) + b"\n"
+
+    def iter_frames(self, raw):
+        """Yield (record, size) for every complete record; stop at a torn tail."""
+        for line in raw.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                return
+            try:
+                record = self.loads(line)
+            except ValueError:
+                return
+            yield record, len(line)
+
+class ORJSONSerializer(JSONSerializer):
+    """orjson: same JSON format as JSONSerializer, several times faster."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        return self._orjson.dumps(obj, default=_json_default, option=self._orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def loads(self, raw):
+        obj = self._orjson.loads(raw)
+        return _untag(obj) if b'"' + DATE_TAG.encode() + b'"' in raw else obj
+
+class MsgPackSerializer(Serializer):
+    """ormsgpack: compact binary records, datetimes as a msgpack ext type."""
+
+    name = "msgpack"
+    extension = ".msgpack"
+    log_suffix = ".msgpack.log"
+    _header = struct.Struct("<I")
+
+    def __init__(self):
+        import ormsgpack
+        self._ormsgpack = ormsgpack
+
+    def _default(self, obj):
+        if isinstance(obj, datetime.datetime):
+            return self._ormsgpack.Ext(MSGPACK_DATETIME_EXT, obj.isoformat().encode("utf-8"))
+        return str(obj)
+
+    @staticmethod
+    def _ext_hook(code, data):
+        if code == MSGPACK_DATETIME_EXT:
+            return datetime.datetime.fromisoformat(data.decode("utf-8"))
+        raise ValueError(f"Unknown msgpack ext type: {code}")
+
+    def dumps(self, obj):
+        return self._ormsgpack.packb(obj, default=self._default, option=self._ormsgpack.OPT_PASSTHROUGH_DATETIME)
+
+    def loads(self, raw):
+        return self._ormsgpack.unpackb(raw, ext_hook=self._ext_hook)
+
+    # Log framing: 4-byte length prefix + payload
+    def frame(self, obj):
+        payload = self.dumps(obj)
+        return self._header.pack(len(payload)) + payload
+
+    def iter_frames(self, raw):
+        offset, size = 0, self._header.size
+        while offset + size <= len(raw):
+            (length,) = self._header.unpack_from(raw, offset)
+            end = offset + size + length
+            if end > len(raw):
+                return  # Torn write
+            try:
+                record = self.loads(raw[offset + size:end])
+            except Exception:
+                return
+            yield record, end - offset
+            offset = end
+
+class ZstdSnapshot:
+    """Wraps a serializer so that snapshots (not log records) are zstd-compressed."""
+
+    def __init__(self, inner, level=3):
+        import zstandard
+        self.inner = inner
+        self.name = inner.name
+        self.extension = inner.extension + ".zst"
+        # Alag log naam, taaki uncompressed snapshot ka log overwrite na ho
+        self.log_suffix = self.extension + ".log"
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def dumps_snapshot(self, obj):
+        return self._compressor.compress(self.inner.dumps(obj))
+
+    def loads_snapshot(self, raw):
+        return self.inner.loads(self._decompressor.decompress(raw))
+
+    def frame(self, obj):
+        return self.inner.frame(obj)
+
+    def iter_frames(self, raw):
+        return self.inner.iter_frames(raw)
+
+SERIALIZERS = {
+    "json": JSONSerializer,
+    "orjson": ORJSONSerializer,
+    "msgpack": MsgPackSerializer,
+}
+
+def get_serializer(name="orjson", compress=None):
+    """
+    Build a serializer by name. `orjson` quietly falls back to stdlib json
+    (same file format) if the package is missing.
+    """
+    name = (name or "json").lower()
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown DB format '{name}', choose from {sorted(SERIALIZERS)}")
+    try:
+        serializer = SERIALIZERS[name]()
+    except ImportError:
+        if name != "orjson":
+            raise
+        print("⚠️ DB: orjson not installed, falling back to stdlib json")
+        serializer = JSONSerializer()
+
+    if compress in (None, "", "none"):
+        return serializer
+    if compress != "zstd":
+        raise ValueError(f"Unknown compression '{compress}', only 'zstd' is supported")
+    return ZstdSnapshot(serializer)
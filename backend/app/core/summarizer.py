@@ -0,0 +1,140 @@
+import os
+import asyncio
+import datetime
+
+from app.core.database import conversations_collection, summaries_collection, iso_ts
+from app.core.llm_gateway import llm_gateway
+from app.core.prompt_builder import estimate_tokens
+
+# --- Rolling conversation summary ---
+# Prompt mein sirf: ek running summary (purane turns) + last K turns.
+# Summary har turn ke baad background mein update hoti hai, jab kaafi
+# naye purane messages jama ho jaayein. Isse prompt size flat rehta hai.
+
+# Prompt mein kitne recent turns raw jaate hain (1 turn = user + Luna)
+HISTORY_TURNS = int(os.getenv("LUNA_HISTORY_TURNS", "6"))
+# Raw history ka max token budget (approx)
+HISTORY_TOKEN_BUDGET = int(os.getenv("LUNA_HISTORY_TOKEN_BUDGET", "1500"))
+# Itne unsummarized purane messages hone pe hi summary update hogi
+SUMMARY_BATCH = int(os.getenv("LUNA_SUMMARY_BATCH", "20"))
+# Ek run mein max itne messages fold honge; lambi purani history agle runs mein catch up karegi
+SUMMARY_MAX_FOLD = int(os.getenv("LUNA_SUMMARY_MAX_FOLD", str(SUMMARY_BATCH * 3)))
+SUMMARY_MAX_WORDS = int(os.getenv("LUNA_SUMMARY_MAX_WORDS", "200"))
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+async def latest_summary(user_id):
+    docs = await summaries_collection.find({"user_id": user_id}).sort("timestamp", -1).to_list(1)
+    return docs[0] if docs else None
+
+async def load_context(user_id, turns=HISTORY_TURNS, token_budget=HISTORY_TOKEN_BUDGET):
+    """
+    Returns (summary_text, recent_messages): the running summary of older
+    turns plus the last `turns` turns, oldest first, trimmed to the budget.
+    """
+    summary = await latest_summary(user_id)
+    query = {"user_id": user_id}
+    if summary:
+        query["timestamp"] = {"$gt": summary["covered_until"]}
+
+    # Latest K turns (pehle galti se sabse purane aa rahe the)
+    recent = await conversations_collection.find(query).sort("timestamp", -1).to_list(turns * 2)
+    recent.reverse()
+
+    # Budget se bahar ho to sabse purane messages chhod do
+    used = 0
+    start = len(recent)
+    while start > 0:
+        cost = estimate_tokens(recent[start - 1].get("content"))
+        if used + cost > token_budget:
+            break
+        used += cost
+        start -= 1
+
+    return (summary or {}).get("summary", ""), recent[start:]
+
+def _format_turns(messages):
+    lines = []
+    for msg in messages:
+        speaker = "User" if msg.get("role") == "user" else "Luna"
+        lines.append(f"{speaker}: {msg.get('content', '')}")
+    return "\n".join(lines)
+
+async def update_summary(user_id, keep_turns=HISTORY_TURNS, batch=SUMMARY_BATCH, max_fold=SUMMARY_MAX_FOLD):
+    """
+    Fold the oldest not-yet-summarized turns (at most `max_fold` messages)
+    into the running summary. Returns True if updated.
+    """
+    summary = await latest_summary(user_id)
+    query = {"user_id": user_id}
+    if summary:
+        query["timestamp"] = {"$gt": summary["covered_until"]}
+
+    # Poori pending history load nahi karte: count, phir sirf zaroori rows
+    pending_count = await conversations_collection.count_documents(query)
+    if pending_count - keep_turns * 2 < batch:
+        return False
+
+    # Recent K turns raw hi rehte hain; turn (same timestamp) beech se nahi katega
+    if keep_turns:
+        recent = await conversations_collection.find(query).sort("timestamp", -1).to_list(keep_turns * 2)
+        query["timestamp"] = {**query.get("timestamp", {}), "$lt": recent[-1]["timestamp"]}
+    # Ek extra row: pata chale cap pe aakhri turn adhoora to nahi
+    older = await conversations_collection.find(query).sort("timestamp", 1).to_list(max_fold + 1)
+    if len(older) > max_fold:
+        last = iso_ts(older[max_fold - 1].get("timestamp"))
+        if iso_ts(older[max_fold].get("timestamp")) == last:
+            # Adhoora turn agle run mein
+            older = [m for m in older[:max_fold] if iso_ts(m.get("timestamp")) < last] or older[:max_fold]
+        else:
+            older = older[:max_fold]
+    if not older:
+        return False
+
+    prompt = f"""
+You maintain a running memory of a chat between a user and Luna (their AI best friend).
+
+Current summary:
+{(summary or {}).get("summary") or "(empty)"}
+
+New messages to fold in:
+{_format_turns(older)}
+
+Write the updated summary in under {SUMMARY_MAX_WORDS} words. Keep facts about the
+user (name, plans, preferences, people, events), open threads and the overall mood.
+Drop small talk. Return ONLY the summary text.
+"""
+    text = await llm_gateway.generate(prompt, model=SUMMARY_MODEL)
+    if not text:
+        return False
+
+    now = datetime.datetime.utcnow()
+    await summaries_collection.insert_one({
+        "user_id": user_id,
+        "summary": text,
+        "covered_until": older[-1].get("timestamp"),
+        "messages_covered": (summary or {}).get("messages_covered", 0) + len(older),
+        "timestamp": now,
+    })
+    # Purani summaries ki zaroorat nahi
+    await summaries_collection.delete_many({"user_id": user_id, "timestamp": {"$lt": now}})
+    print(f"📝 Summary: Folded {len(older)} messages for {user_id}")
+    return True
+
+_running = {}
+
+def schedule_summary(user_id):
+    """Fire-and-forget summary update after a turn is saved (one at a time per user)."""
+    task = _running.get(user_id)
+    if task is not None and not task.done():
+        return task
+
+    async def run():
+        try:
+            await update_summary(user_id)
+        except Exception as e:
+            print(f"⚠️ Summary Error for {user_id}: {e}")
+        finally:
+            _running.pop(user_id, None)
+
+    task = _running[user_id] = asyncio.create_task(run())
+    return task
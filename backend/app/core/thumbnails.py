@@ -0,0 +1,105 @@
+import os
+import threading
+import xxhash
+from PIL import Image, ImageOps
+
+from app.core.uploads import UPLOAD_DIR
+
+# --- Gallery thumbnails ---
+# Har upload ke kuch fixed widths ke WebP variants, uploads/.thumbs mein cache.
+# Upload ke baad background mein ban jaate hain; purani photos ke pehli
+# request pe (lazy). Source files content-addressed hain (naam = hash), isliye
+# thumbnail URL kabhi badalta nahi -> browser "immutable" cache kar sakta hai.
+
+THUMB_WIDTHS = sorted(int(w) for w in os.getenv("LUNA_THUMB_WIDTHS", "160,480,1024").split(",") if w.strip())
+THUMB_QUALITY = int(os.getenv("LUNA_THUMB_QUALITY", "80"))
+THUMB_DIR = os.path.join(UPLOAD_DIR, ".thumbs")
+THUMB_URL_PREFIX = "api/thumbnails"
+
+# Same photo ke liye do threads ek saath decode na karein (striped locks, dict nahi badhti)
+_locks = [threading.Lock() for _ in range(64)]
+_etags = {}  # thumb path -> (mtime_ns, etag)
+
+def source_path(relative):
+    """Upload path for a URL-relative path, or None if it escapes uploads/ or is internal (.thumbs, .tmp)."""
+    parts = relative.replace("\\", "/").split("/")
+    if not relative or any(not part or part.startswith(".") for part in parts):
+        return None
+    root = os.path.realpath(UPLOAD_DIR)
+    path = os.path.realpath(os.path.join(root, *parts))
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return path
+
+def thumbnail_path(relative, width):
+    return os.path.join(THUMB_DIR, str(width), os.path.splitext(relative)[0] + ".webp")
+
+def generate(source, relative, widths=THUMB_WIDTHS):
+    """Decode the source once and write every missing width (largest first). Returns the widths written."""
+    missing = [w for w in sorted(widths, reverse=True) if not os.path.exists(thumbnail_path(relative, w))]
+    if not missing:
+        return []
+    with Image.open(source) as img:
+        img.draft("RGB", (missing[0], missing[0]))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        for width in missing:
+            # Chhoti photo ko upscale nahi karte
+            if img.width > width:
+                img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+            dest = thumbnail_path(relative, width)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = f"{dest}.{threading.get_ident()}.tmp"
+            img.save(tmp, format="WEBP", quality=THUMB_QUALITY, method=4)
+            os.replace(tmp, dest)
+    return missing
+
+def ensure_thumbnail(relative, width):
+    """Path of the cached `width` thumbnail for an upload, generating all sizes on a miss."""
+    if width not in THUMB_WIDTHS:
+        raise ValueError(f"Unsupported thumbnail width {width}")
+    source = source_path(relative)
+    if source is None or not os.path.isfile(source):
+        raise FileNotFoundError(relative)
+    dest = thumbnail_path(relative, width)
+    if not os.path.exists(dest):
+        with _locks[hash(relative) % len(_locks)]:
+            generate(source, relative)
+    return dest
+
+def etag_for(path):
+    """Strong ETag: hash of the thumbnail bytes, memoized per file version."""
+    mtime = os.stat(path).st_mtime_ns
+    cached = _etags.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        etag = f'"{xxhash.xxh3_64_hexdigest(f.read())}"'
+    _etags[path] = (mtime, etag)
+    return etag
+
+def warm(image_url):
+    """Generate all sizes right after an upload (called off the event loop)."""
+    relative = _relative(image_url)
+    source = source_path(relative) if relative else None
+    if source is None:
+        return
+    try:
+        with _locks[hash(relative) % len(_locks)]:
+            written = generate(source, relative)
+        if written:
+            print(f"🖼️ Thumbnails: {relative} -> {sorted(written)}")
+    except Exception as e:
+        print(f"⚠️ Thumbnail Error for {relative}: {e}")
+
+def _relative(image_url):
+    # Sirf local uploads ke thumbnails (Pollinations jaise http URLs nahi)
+    url = (image_url or "").lstrip("/")
+    prefix = UPLOAD_DIR.strip("/") + "/"
+    return url[len(prefix):] if url.startswith(prefix) else None
+
+def thumbnail_urls(image_url):
+    """{width: url} for a gallery image_url; empty for remote images."""
+    relative = _relative(image_url)
+    if not relative:
+        return {}
+    return {str(width): f"{THUMB_URL_PREFIX}/{width}/{relative}" for width in THUMB_WIDTHS}
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+import xxhash
+
+# --- Streaming uploads ---
+# Upload ko chunk-by-chunk disk pe likho (thread mein), saath mein hash
+# bhi nikal lo. Poori file kabhi memory mein nahi aati, aur size limit
+# beech mein hi lag jaati hai. Phir hash ke naam se store mein daal do.
+
+UPLOAD_DIR = "uploads"
+# Store ka SQLite index uploads/ ke bahar (uploads/ static serve hota hai), luna_memory.* ke paas
+UPLOAD_STORE_DB = os.getenv("LUNA_UPLOAD_STORE_DB", "luna_uploads.db")
+# Max upload size (bytes), default 20 MB
+UPLOAD_MAX_BYTES = int(os.getenv("LUNA_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+class UploadTooLarge(Exception):
+    pass
+
+def _write_chunk(f, hasher, chunk):
+    hasher.update(chunk)
+    f.write(chunk)
+
+def _flush(f):
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+def _discard(f, tmp_path):
+    f.close()
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+async def stream_to_temp(file, dest_dir=UPLOAD_DIR, max_bytes=UPLOAD_MAX_BYTES):
+    """
+    Copy an UploadFile to a temp file under `dest_dir` in fixed-size chunks,
+    off the event loop, hashing on the fly. Returns (tmp_path, size,
+    xxh3_128 hex digest). Raises UploadTooLarge as soon as the limit is crossed.
+    """
+    tmp_dir = os.path.join(dest_dir, ".tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    hasher = xxhash.xxh3_128()
+    size = 0
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            await asyncio.to_thread(_write_chunk, f, hasher, chunk)
+        await asyncio.to_thread(_flush, f)
+    except BaseException:
+        await asyncio.to_thread(_discard, f, tmp_path)
+        raise
+
+    return tmp_path, size, hasher.hexdigest()
+
+class ContentStore:
+    """
+    Content-addressed upload store: uploads/<ab>/<cd>/<digest><ext>.
+    Same bytes = same file. A small SQLite table (safe across workers)
+    keeps the cached vision analysis and a refcount per digest.
+
+    The refcount is the number of visual-memory docs pointing at the file,
+    plus one hold per upload request still working with it (taken by put(),
+    dropped by release() when the request ends). A file is deleted when
+    the count reaches zero, i.e. no memory uses it and no request needs it.
+    """
+
+    def __init__(self, root=UPLOAD_DIR, db_path=UPLOAD_STORE_DB):
+        self.root = root
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "digest TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER, "
+                "refcount INTEGER NOT NULL DEFAULT 0, analysis TEXT, created REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_blobs_path ON blobs (path)")
+            self._local.conn = conn
+        return conn
+
+    def path_for(self, digest, extension=""):
+        # Sharded dirs: ek folder mein lakhon files na hon
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}{extension}")
+
+    def put(self, tmp_path, digest, size, extension=""):
+        """
+        Move a hashed temp file into the store, or drop it if the content is
+        already stored. Takes a request hold on the blob (drop it with
+        release()). Returns (path, is_duplicate).
+        """
+        conn = self._conn()
+        with conn:
+            # BEGIN IMMEDIATE: do workers same file ek saath na daalein
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT path FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(row[0]):
+                os.remove(tmp_path)
+                conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+                return row[0], True
+
+            path = self.path_for(digest, extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            conn.execute(
+                "INSERT INTO blobs (digest, path, size, refcount, created) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET path = excluded.path, refcount = refcount + 1",
+                (digest, path, size, time.time()),
+            )
+            return path, False
+
+    def retain(self, path):
+        """One more memory doc points at `path`. No-op for files outside the store (pre-store uploads, URLs)."""
+        with self._conn() as conn:
+            conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE path = ?", (path,))
+
+    def release(self, digest):
+        """Drop one reference (a request hold); the file is deleted when nothing points at it anymore."""
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT path, refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return
+            if row[1] > 1:
+                conn.execute("UPDATE blobs SET refcount = refcount - 1 WHERE digest = ?", (digest,))
+                return
+            conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            try:
+                os.remove(row[0])
+            except FileNotFoundError:
+                pass
+
+    def get_analysis(self, digest):
+        row = self._conn().execute("SELECT analysis FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def set_analysis(self, digest, analysis):
+        with self._conn() as conn:
+            conn.execute("UPDATE blobs SET analysis = ? WHERE digest = ?", (json.dumps(analysis, default=str), digest))
+
+    def refcount(self, digest):
+        row = self._conn().execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+# Singleton Instance
+content_store = ContentStore()
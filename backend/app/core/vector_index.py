@@ -0,0 +1,177 @@
+import asyncio
+import numpy as np
+
+from app.core.database import visual_memory_collection
+from app.core.llm_gateway import llm_gateway, EMBED_DIM
+
+# --- Per-user vector index for visual memories ---
+# Har memory ka embedding doc ke saath hi save hota hai (`embedding` field),
+# taaki har worker DB se index bana sake. Index memory mein: ek normalized
+# float32 matrix per user, query = ek matrix-vector dot (brute force, NumPy).
+# PerUserIndex baaki per-user indexes ka base bhi hai: index mein sirf memory
+# ids rehti hain, docs DB mein; search ke top results hi load hote hain.
+
+def memory_text(doc):
+    # Jo text embed hota hai: description + objects + tags + mood
+    parts = [doc.get("description") or doc.get("scene") or ""]
+    parts += doc.get("objects") or []
+    parts += doc.get("tags") or []
+    if doc.get("mood"):
+        parts.append(f"mood: {doc['mood']}")
+    return ", ".join(str(p) for p in parts if p)
+
+def _normalize(vectors):
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBED_DIM)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class UserIndex:
+    """Per-user index state. Holds memory ids by position, never the docs themselves."""
+
+    def __init__(self):
+        self.ids = []
+        self.doc_count = 0  # DB count jisse yeh index bana (bina entry wale docs bhi)
+
+class PerUserIndex:
+    """
+    Base for the per-worker, per-user indexes over visual memories (vectors,
+    full-text, perceptual hashes, stats). A user's index is built on first
+    use and rebuilt when the DB count no longer matches, e.g. after another
+    worker inserted a memory. Subclasses fill in new_index() and insert().
+    """
+
+    def __init__(self, collection=visual_memory_collection):
+        self.collection = collection
+        self._users = {}
+        self._locks = {}
+
+    def new_index(self):
+        return UserIndex()
+
+    def insert(self, index, doc):
+        """Add one memory doc to a user's index."""
+        raise NotImplementedError
+
+    async def fill(self, user_id, index, docs):
+        """Build a fresh index from all of a user's docs."""
+        for doc in docs:
+            self.insert(index, doc)
+
+    def user_map(self):
+        return self._users
+
+    def add(self, user_id, doc):
+        """Incremental insert after a memory is saved (only if this worker already has the user loaded)."""
+        index = self.user_map().get(user_id)
+        if index is None:
+            return
+        index.doc_count += 1
+        self.insert(index, doc)
+
+    async def rebuild(self, user_id):
+        docs = await self.collection.find({"user_id": user_id}).to_list(None)
+        index = self.new_index()
+        index.doc_count = len(docs)
+        await self.fill(user_id, index, docs)
+        self.user_map()[user_id] = index
+        return index
+
+    async def _ensure(self, user_id):
+        # Dusre worker ne memory add ki ho to count match nahi karega -> rebuild
+        count = await self.collection.count_documents({"user_id": user_id})
+        index = self.user_map().get(user_id)
+        if index is not None and index.doc_count == count:
+            return index
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock:
+            index = self.user_map().get(user_id)
+            if index is not None and index.doc_count == count:
+                return index
+            return await self.rebuild(user_id)
+
+    async def load(self, user_id, ids):
+        """Memory docs for `ids`, in the same order (deleted ones are skipped)."""
+        if not ids:
+            return []
+        docs = await self.collection.find({"user_id": user_id, "_id": {"$in": list(ids)}}).to_list(None)
+        by_id = {doc["_id"]: doc for doc in docs}
+        return [by_id[_id] for _id in ids if _id in by_id]
+
+class UserVectors(UserIndex):
+    def __init__(self):
+        super().__init__()
+        self.matrix = np.zeros((0, EMBED_DIM), dtype=np.float32)
+        self.pending = 0  # Backfill fail hua in memories ke liye; count mismatch -> agli search pe retry
+
+    def append(self, docs, vectors):
+        if docs:
+            self.matrix = np.vstack([self.matrix, _normalize(vectors)])
+            self.ids.extend(doc["_id"] for doc in docs)
+
+class VisualMemoryIndex(PerUserIndex):
+    def new_index(self):
+        return UserVectors()
+
+    async def embed_doc(self, doc):
+        """Embedding for a memory doc, or None if the embedding call fails."""
+        text = memory_text(doc)
+        if not text:
+            return None
+        try:
+            return (await llm_gateway.embed([text]))[0]
+        except Exception as e:
+            print(f"⚠️ Vector Index: Embedding failed: {e}")
+            return None
+
+    def insert(self, index, doc):
+        vector = doc.get("embedding")
+        if vector and len(vector) == EMBED_DIM:
+            index.append([doc], [vector])
+
+    async def fill(self, user_id, index, docs):
+        with_vectors = [d for d in docs if len(d.get("embedding") or []) == EMBED_DIM]
+        # Purani memories (embedding se pehle ki) yahin embed ho jaati hain
+        missing = [d for d in docs if len(d.get("embedding") or []) != EMBED_DIM and memory_text(d)]
+
+        index.append(with_vectors, [d["embedding"] for d in with_vectors])
+        if missing:
+            try:
+                vectors = await llm_gateway.embed([memory_text(d) for d in missing])
+                index.append(missing, vectors)
+            except Exception as e:
+                print(f"⚠️ Vector Index: Backfill failed for {len(missing)} memories: {e}")
+                # Poora count mat likho, warna count badalne tak retry hi nahi hoga
+                index.doc_count -= len(missing)
+                index.pending = len(missing)
+
+        print(f"🧭 Vector Index: Built for {user_id} ({len(index.ids)}/{len(docs)} memories)")
+
+    async def search(self, user_id, query, k=5):
+        """
+        Top-k memories by cosine similarity as [(score, doc)], best first.
+        Returns None when vector search is unavailable (no vectors or the
+        query could not be embedded), so callers can fall back.
+        """
+        index = await self._ensure(user_id)
+        if index.doc_count + index.pending == 0:
+            return []
+        if not index.ids:
+            return None
+        try:
+            query_vector = _normalize(await llm_gateway.embed([query]))[0]
+        except Exception as e:
+            print(f"⚠️ Vector Index: Query embedding failed: {e}")
+            return None
+
+        scores = index.matrix @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        docs = await self.load(user_id, [index.ids[i] for i in top])
+        by_id = {doc["_id"]: doc for doc in docs}
+        return [(float(scores[i]), by_id[index.ids[i]]) for i in top if index.ids[i] in by_id]
+
+# Singleton Instance
+visual_index = VisualMemoryIndex()
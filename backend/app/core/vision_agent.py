@@ -6,7 +6,8 @@ from typing import TypedDict, Optional, List, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
-from app.core.database import visual_memory_collection
+from app.core.llm_gateway import llm_gateway
+from app.core.rag import luna_rag
 
 # --- 1. CONFIGURATION ---
 DISALLOWED_PATTERNS = [
@@ -20,7 +21,9 @@ DISALLOWED_PATTERNS = [
 class VisionState(TypedDict):
     user_id: str
     image_base64: str
+    image_mime: Optional[str]
     image_url: Optional[str]
+    phash: Optional[str]
     raw_analysis_text: str
     parsed_analysis: Dict[str, Any]
     is_safe: bool
@@ -70,13 +73,13 @@ OUTPUT RAW JSON ONLY. NO MARKDOWN. NO BACKTICKS.
             {"type": "text", "text": prompt},
             {
                 "type": "image_url",
-                "image_url": {"url": f"data:image/jpeg;base64,{state['image_base64']}"}
+                "image_url": {"url": f"data:{state.get('image_mime') or 'image/jpeg'};base64,{state['image_base64']}"}
             }
         ]
     )
 
     try:
-        response = await llm.ainvoke([message])
+        response = await llm_gateway.run(llm.ainvoke([message]))
         # print(f"🔹 RAW AI RESPONSE: {response.content}") # Debugging ke liye remove comment
         return {"raw_analysis_text": response.content}
     except Exception as e:
@@ -162,9 +165,10 @@ async def node_save_memory(state: VisionState):
             "objects": state['parsed_analysis'].get('objects', []),
             "tags": state['parsed_analysis'].get('tags', []),
             "safety_score": state['parsed_analysis'].get('safety_score', 100),
+            "phash": state.get('phash'),
             "timestamp": datetime.datetime.utcnow()
         }
-        visual_memory_collection.insert_one(doc)
+        await luna_rag.store_memory(doc)
         return {"status": "saved"}
     else:
          return {"status": "blocked"}
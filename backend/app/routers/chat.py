@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from app.core.agent import luna_agent
-from app.core.database import conversations_collection
+import json
 import traceback
 
 router = APIRouter()
@@ -12,26 +13,17 @@ class ChatRequest(BaseModel):
     message: Optional[str] = None
     imageAnalysis: Optional[Dict[str, Any]] = None
 
+
 @router.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     try:
         print(f"--- 🧠 CHAT REQUEST FROM: {request.user_id} ---")
 
-        # Load conversation history
-        # 👇 FIX: await aur .to_list() hataya (Local DB ke liye)
-        history_cursor = conversations_collection.find(
-            {"user_id": request.user_id}
-        ).sort("timestamp", 1).limit(15)
-        
-        # Local DB cursor seedha list mein convert ho jata hai
-        history = list(history_cursor)
-
-        # Process message through agent
+        # History + summary agent ka retrieve node khud load karta hai
         response_data = await luna_agent.process_message(
             user_id=request.user_id,
             message=request.message,
-            image_analysis=request.imageAnalysis,
-            history=history
+            image_analysis=request.imageAnalysis
         )
 
         return response_data
@@ -39,4 +31,31 @@ async def chat_endpoint(request: ChatRequest):
     except Exception as e:
         print(f"Chat Error: {e}")
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Same as /chat, but streams the reply over Server-Sent Events:
+    `token` events with {"text"} as Gemini generates them, then one `done`
+    event with {"reply", "photo_url"} once the turn is saved (or `error`).
+    """
+    print(f"--- 🧠 STREAM CHAT REQUEST FROM: {request.user_id} ---")
+
+    async def event_source():
+        async for event, data in luna_agent.stream_message(
+            user_id=request.user_id,
+            message=request.message,
+            image_analysis=request.imageAnalysis
+        ):
+            yield sse_event(event, {"text": data} if event == "token" else data)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        # Proxy (nginx) buffering band, warna tokens ek saath aayenge
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
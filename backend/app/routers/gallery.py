@@ -1,50 +1,38 @@
 from fastapi import APIRouter, HTTPException, Query
 from app.core.database import visual_memory_collection
+from app.core.search_index import gallery_index
+from app.core.gallery_stats import gallery_stats
+from app.core.thumbnails import thumbnail_urls
 from typing import Optional
+import datetime
 import traceback
 
 router = APIRouter()
 
 @router.get("/gallery/{user_id}")
 async def get_user_gallery(user_id: str, search: Optional[str] = Query(None)):
-    """Get all images from visual memory with optional search"""
+    """Get images from visual memory, newest first or ranked by `search` (AND by default, OR with 'OR' or '|')"""
     try:
-        # 1. Fetch ALL memories for user (Sync Call)
-        # Local DB complex queries ($or, $regex) support nahi karta, 
-        # isliye hum pehle sab data layenge fir Python mein filter karenge.
-        cursor = visual_memory_collection.find({"user_id": user_id}).sort("timestamp", -1)
-        all_memories = list(cursor)
-        
-        # 2. Manual Filtering (Python Logic instead of DB Logic)
-        filtered_memories = []
-        
         if search:
-            search_lower = search.lower()
-            for mem in all_memories:
-                # Check description, tags, objects
-                desc = mem.get("description", "") or ""
-                tags = mem.get("tags", []) or []
-                objects = mem.get("objects", []) or []
-                
-                in_desc = search_lower in desc.lower()
-                in_tags = any(search_lower in t.lower() for t in tags)
-                in_objs = any(search_lower in o.lower() for o in objects)
-                
-                if in_desc or in_tags or in_objs:
-                    filtered_memories.append(mem)
+            # Inverted index: sirf matching postings, relevance + recency se ranked
+            memories = await gallery_index.search(user_id, search, limit=100)
         else:
-            filtered_memories = all_memories
-
-        # Limit to 100 most recent
-        memories = filtered_memories[:100]
+            # Limit to 100 most recent
+            memories = await visual_memory_collection.find({"user_id": user_id}).sort("timestamp", -1).to_list(100)
         
-        # 3. Format response
+        # Format response
         formatted_memories = []
         for mem in memories:
+            image_url = mem.get("image_url") or mem.get("image_path")
+            ts = mem.get("timestamp")
+            # Grid ke liye chhote variants (width -> URL), full size sirf click pe
+            thumbs = thumbnail_urls(image_url)
             formatted_memories.append({
                 "id": str(mem.get("_id", "")), # Safety check
                 # Support both image_url (URL) and image_path (Local File)
-                "image_url": mem.get("image_url") or mem.get("image_path"),
+                "image_url": image_url,
+                "thumbnails": thumbs,
+                "srcset": ", ".join(f"{url} {width}w" for width, url in thumbs.items()),
                 "description": mem.get("description"),
                 "scene": mem.get("scene"),
                 "objects": mem.get("objects", []),
@@ -53,7 +41,8 @@ async def get_user_gallery(user_id: str, search: Optional[str] = Query(None)):
                 "tags": mem.get("tags", []),
                 "safety_score": mem.get("safety_score", 100),
                 "memory_type": mem.get("memory_type"),
-                "timestamp": str(mem.get("timestamp"))
+                # Naye docs mein datetime, purane mein ISO string -> dono ek hi format mein
+                "timestamp": ts.isoformat() if isinstance(ts, datetime.datetime) else str(ts)
             })
         
         return formatted_memories
@@ -64,31 +53,34 @@ async def get_user_gallery(user_id: str, search: Optional[str] = Query(None)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/gallery/{user_id}/stats")
-async def get_gallery_stats(user_id: str):
-    """Get statistics about user's gallery"""
+async def get_gallery_stats(user_id: str, top_tags: int = Query(20, ge=0, le=200)):
+    """Get statistics about user's gallery (materialized, no rescan)"""
     try:
-        # 1. Fetch Data (Sync)
-        cursor = visual_memory_collection.find({"user_id": user_id})
-        memories = list(cursor)
-        
-        total = len(memories)
-        
-        # 2. Calculate Mood Distribution Manually 
-        # (Kyunki Local DB 'aggregate' support nahi karta)
-        mood_counts = {}
-        for mem in memories:
-            mood = mem.get("mood", "unknown")
-            if mood:
-                mood_counts[mood] = mood_counts.get(mood, 0) + 1
-        
+        stats = await gallery_stats.get(user_id)
+
         # Convert to list format like MongoDB used to return
-        mood_dist = [{"_id": k, "count": v} for k, v in mood_counts.items()]
-        
+        mood_dist = [{"_id": k, "count": v} for k, v in stats.moods.items()]
+
         return {
-            "total_images": total,
-            "mood_distribution": mood_dist
+            "total_images": stats.total,
+            "mood_distribution": mood_dist,
+            "memory_type_distribution": [{"_id": k, "count": v} for k, v in stats.memory_types.items()],
+            # Tag cloud + time histogram (dashboard ke liye)
+            "top_tags": [{"tag": k, "count": v} for k, v in stats.tags.most_common(top_tags)],
+            "daily_counts": [{"day": k, "count": v} for k, v in sorted(stats.days.items())]
         }
     
     except Exception as e:
         print(f"Stats Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/gallery/{user_id}/stats/rebuild")
+async def rebuild_gallery_stats(user_id: str):
+    """Recompute a user's gallery stats from the store"""
+    try:
+        stats = await gallery_stats.rebuild(user_id)
+        return {"status": "rebuilt", "total_images": stats.total}
+
+    except Exception as e:
+        print(f"Stats Rebuild Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
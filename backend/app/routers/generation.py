@@ -1,18 +1,17 @@
-import os
+import asyncio
 import datetime
 import random
 import traceback
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from google import genai
 from app.core.database import generated_images_collection
+from app.core.llm_gateway import llm_gateway
 # ✅ Correct Import
 from app.core.photoengine import select_companion_photo
 
 router = APIRouter()
 
 # Setup Gemini
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 model_name = 'gemini-2.5-flash' 
 
 # --- 🌟 SECTION 1: DYNAMIC VARIABLES (Randomness) ---
@@ -97,11 +96,11 @@ Return ONLY the subject string.
 Example Input: "I want to see her drinking coffee happily"
 Example Output: "A young woman drinking coffee from a ceramic mug"
 """
-        result = client.models.generate_content(
-            model=model_name,
-            contents=extraction_prompt
-        )
-        visual_subject = result.text.strip()
+        try:
+            visual_subject = await llm_gateway.generate(extraction_prompt, model=model_name, cache=True)
+        except asyncio.TimeoutError:
+            # Gemini slow hai to user ka prompt hi use kar lo
+            visual_subject = ""
         
         # Safety fallback
         if not visual_subject or len(visual_subject) < 3:
@@ -127,8 +126,8 @@ Example Output: "A young woman drinking coffee from a ceramic mug"
             "timestamp": datetime.datetime.utcnow()
         }
         
-        # Local DB insert (Synchronous)
-        generated_images_collection.insert_one(image_doc)
+        # Async insert (DB I/O thread / Motor)
+        await generated_images_collection.insert_one(image_doc)
 
         print(f"✅ Photo Generated: {image_url}")
 
@@ -147,20 +146,20 @@ Example Output: "A young woman drinking coffee from a ceramic mug"
 async def get_generated_images(user_id: str):
     """Get all generated images for a user"""
     try:
-        cursor = generated_images_collection.find(
+        images = await generated_images_collection.find(
             {"user_id": user_id}
-        ).sort("timestamp", -1).limit(50)
-        
-        images = list(cursor)
+        ).sort("timestamp", -1).to_list(50)
         
         formatted_images = []
         for img in images:
+            ts = img.get("timestamp")
             formatted_images.append({
                 "id": str(img.get("_id", "")),
                 "prompt": img.get("prompt"),
                 "image_url": img.get("image_url"),
                 "caption": img.get("caption"),
-                "timestamp": str(img.get("timestamp"))
+                # Naye docs mein datetime, purane mein ISO string -> dono ek hi format mein
+                "timestamp": ts.isoformat() if isinstance(ts, datetime.datetime) else str(ts)
             })
         
         return formatted_images
@@ -1,36 +1,136 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from app.core.database import conversations_collection
+from app.core.archive import archive_store
+from typing import Optional
+import asyncio
+import datetime
 import traceback
 
 router = APIRouter()
 
+def format_message(msg):
+    # Format for frontend
+    ts = msg.get("timestamp")
+    return {
+        "role": msg.get("role"),
+        "content": msg.get("content"),
+        "type": msg.get("type", "text"),
+        "image_url": msg.get("image_url"),
+        "photo_sent": msg.get("photo_sent"),
+        "timestamp": ts.isoformat() if isinstance(ts, datetime.datetime) else str(ts)
+    }
+
+def _parse_cursor(value):
+    # "2025-12-18 12:51:59" aur "2025-12-18T12:51:59" dono chalte hain
+    return datetime.datetime.fromisoformat(value) if value else None
+
+async def _fetch_window(user_id, before, after, n, newest_first):
+    """
+    Read up to `n` messages in walk order, hot store first for newest-first
+    walks and archive first for oldest-first walks. Retention always moves a
+    user's oldest turns, so the two tiers never interleave in time.
+    """
+    ts_range = {}
+    if before:
+        ts_range["$lt"] = before
+    if after:
+        ts_range["$gt"] = after
+    query = {"user_id": user_id}
+    if ts_range:
+        query["timestamp"] = ts_range
+
+    if newest_first:
+        docs = await conversations_collection.find(query).sort("timestamp", -1).to_list(n)
+        if len(docs) < n:
+            docs += await asyncio.to_thread(archive_store.find, user_id, before, after, n - len(docs), True)
+        return docs
+
+    docs = await asyncio.to_thread(archive_store.find, user_id, before, after, n, False)
+    if len(docs) < n:
+        docs += await conversations_collection.find(query).sort("timestamp", 1).to_list(n - len(docs))
+    return docs
+
 @router.get("/history/{user_id}")
-async def get_conversation_history(user_id: str):
+async def get_conversation_history(
+    user_id: str,
+    before: Optional[str] = Query(None, description="Cursor: only messages older than this timestamp"),
+    after: Optional[str] = Query(None, description="Cursor: only messages newer than this timestamp"),
+    limit: int = Query(50, ge=1, le=200),
+    newest_first: bool = Query(False, description="Return the page newest-first instead of chronological")
+):
+    """
+    Keyset-paginated chat history.
+
+    Without cursors this returns the latest `limit` messages. Use `next_before`
+    to lazy-load older pages and `next_after` to fetch newer ones. A page
+    never splits messages that share a timestamp (a user/assistant turn).
+    """
+    try:
+        before_ts, after_ts = _parse_cursor(before), _parse_cursor(after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
     try:
-        # Get last 50 messages from Local DB
-        # 👇 FIX: Removed 'await' logic. Local DB is synchronous.
-        cursor = conversations_collection.find(
-            {"user_id": user_id}
-        ).sort("timestamp", 1).limit(50)
-        
-        # Local DB cursor behaves like a list, so just convert it
-        history = list(cursor)
-        
-        # Format for frontend
-        formatted_history = []
-        for msg in history:
-            formatted_history.append({
-                "role": msg.get("role"),
-                "content": msg.get("content"),
-                "type": msg.get("type", "text"),
-                "image_url": msg.get("image_url"),
-                "photo_sent": msg.get("photo_sent"),
-                "timestamp": str(msg.get("timestamp"))
-            })
-            
-        return formatted_history
+        # Sirf `after` diya ho to aage ki taraf chalo, warna latest se peeche ki taraf
+        walk_newest_first = not (after_ts and not before_ts)
+
+        # Ek extra doc padho: isse pata chalta hai aage aur data hai ya nahi
+        docs = await _fetch_window(user_id, before_ts, after_ts, limit + 1, walk_newest_first)
+        has_more = len(docs) > limit
+        if has_more:
+            stamps = [format_message(msg)["timestamp"] for msg in docs]
+            cut = limit
+            # Same timestamp wala turn beech se mat kaato
+            while cut > 0 and stamps[cut] == stamps[cut - 1]:
+                cut -= 1
+            docs = docs[:cut or limit]
+
+        page = [format_message(msg) for msg in docs]
+        if walk_newest_first:
+            page.reverse()
+            has_older, has_newer = has_more, before_ts is not None
+        else:
+            has_older, has_newer = True, has_more
+        if newest_first:
+            page.reverse()
+
+        oldest = min((m["timestamp"] for m in page), default=None)
+        newest = max((m["timestamp"] for m in page), default=None)
+        return {
+            "messages": page,
+            "next_before": oldest if has_older else None,
+            "next_after": newest if has_newer else None
+        }
 
     except Exception as e:
         print(f"History Error: {e}")
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/history/{user_id}/archive")
+async def get_archived_history(
+    user_id: str,
+    before: Optional[str] = Query(None, description="ISO timestamp; only messages older than this"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Page into the cold archive (messages moved out of the hot store by retention)"""
+    try:
+        if before:
+            # "2025-12-18 12:51:59" aur "2025-12-18T12:51:59" dono chalte hain
+            before = datetime.datetime.fromisoformat(before).isoformat()
+
+        # Segment files disk se padhni hain, isliye thread mein
+        docs = await asyncio.to_thread(archive_store.find, user_id, before, None, limit, True)
+        docs.reverse()  # Purane se naya, chat jaisa
+
+        return {
+            "messages": [format_message(msg) for msg in docs],
+            "next_before": format_message(docs[0])["timestamp"] if len(docs) == limit else None
+        }
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid 'before' timestamp: {e}")
+    except Exception as e:
+        print(f"Archive History Error: {e}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
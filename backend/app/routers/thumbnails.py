@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+from PIL import UnidentifiedImageError
+import asyncio
+
+from app.core.thumbnails import ensure_thumbnail, etag_for
+
+router = APIRouter()
+
+# URL mein content hash hai (content-addressed uploads), isliye saal bhar cache
+CACHE_HEADERS = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+@router.get("/thumbnails/{width}/{path:path}")
+async def get_thumbnail(width: int, path: str, request: Request):
+    """Cached WebP thumbnail of an upload, generated on first request"""
+    try:
+        thumb = await asyncio.to_thread(ensure_thumbnail, path, width)
+        etag = await asyncio.to_thread(etag_for, thumb)
+        headers = {**CACHE_HEADERS, "ETag": etag}
+
+        # Browser ke paas same version hai -> body bhejne ki zaroorat nahi
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(thumb, media_type="image/webp", headers=headers)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (FileNotFoundError, UnidentifiedImageError):
+        raise HTTPException(status_code=404, detail="Image not found")
+    except Exception as e:
+        print(f"❌ Thumbnail Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
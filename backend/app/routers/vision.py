@@ -1,16 +1,18 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-import base64
+import asyncio
 import os
-import shutil
-import uuid
 # ✅ Fixed Import
 from app.core.vision_agent import vision_agent
 from app.core.rag import luna_rag
+from app.core.uploads import stream_to_temp, content_store, UploadTooLarge, UPLOAD_DIR
+from app.core.database import visual_memory_collection
+from app.core.imaging import model_base64, perceptual_hash
+from app.core.phash_index import phash_index
+from app.core.thumbnails import warm as warm_thumbnails
 
 router = APIRouter()
 
 # Uploads directory setup
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/analyze-image")
@@ -18,58 +20,134 @@ async def analyze_image(user_id: str = Form(...), file: UploadFile = File(...)):
     try:
         print(f"--- 📸 ANALYZING IMAGE FOR: {user_id} ---")
         
-        # 1. Generate unique filename & Save to Disk
-        file_extension = file.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        
-        with open(file_path, "wb") as buffer:
-            # File read karo
-            content = await file.read()
-            buffer.write(content)
-            
-        # 2. Convert to Base64 (For AI Agent)
-        image_b64 = base64.b64encode(content).decode("utf-8")
-        
-        # 3. Define Image URL/Path (For Database/Gallery)
-        # Hum file path save karenge taaki gallery isse load kar sake
-        image_url = file_path 
+        # 1. Stream to Disk (chunks, size limit, hash on the fly)
+        file_extension = os.path.splitext(file.filename or "")[1].lower() or ".jpg"
+        try:
+            tmp_path, size, digest = await stream_to_temp(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        # 2. Content-addressed store: same bytes = same file
+        file_path, is_duplicate = await asyncio.to_thread(content_store.put, tmp_path, digest, size, file_extension)
+        print(f"📥 Upload stored: {file_path} ({size:,} bytes, {'duplicate' if is_duplicate else 'new'})")
+
+        try:
+            # 3. Define Image URL/Path (For Database/Gallery)
+            # Hum file path save karenge taaki gallery isse load kar sake
+            image_url = file_path 
+
+            # Perceptual hash: bytes alag hon par photo wahi (resize / recompress / burst)
+            try:
+                phash = await asyncio.to_thread(perceptual_hash, file_path)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Not a readable image: {e}")
+
+            # 4. Duplicate hai aur analysis pehle se hai -> Gemini vision dobara nahi
+            cached = await asyncio.to_thread(content_store.get_analysis, digest) if is_duplicate else None
+            if cached:
+                print(f"♻️ Reusing cached analysis for {digest[:12]}")
+                analysis = cached["parsed_analysis"]
+                already_saved = await visual_memory_collection.count_documents({"user_id": user_id, "image_url": image_url})
+                if cached["is_safe"] and not already_saved:
+                    await luna_rag.memorize_image(
+                        user_id=user_id,
+                        image_url=image_url,
+                        description=analysis.get("scene", "Unknown image"),
+                        analysis=analysis,
+                        phash=phash
+                    )
+                return {
+                    "analysis": analysis,
+                    "status": "duplicate",
+                    "is_safe": cached["is_safe"],
+                    "safety_issues": cached["safety_issues"]
+                }
+
+            # Near-duplicate: user ke gallery mein lagbhag wahi photo -> usi entry mein merge
+            near = await phash_index.find_near_duplicate(user_id, phash)
+            if near:
+                distance, existing = near
+                print(f"🪞 Near-duplicate of {existing.get('image_url')} (distance {distance}), skipping vision call")
+                # Nayi copy rakhne ki zaroorat nahi, gallery purani entry hi dikhayegi (release finally mein).
+                # Safety purani entry ki hi (jo analysis hua tha), hardcode nahi
+                is_safe = existing.get("safety_score", 100) >= 100
+                return {
+                    "analysis": {
+                        "comment": existing.get("luna_comment") or "",
+                        "scene": existing.get("description") or existing.get("scene", ""),
+                        "objects": existing.get("objects", []),
+                        "mood": existing.get("mood"),
+                        "tags": existing.get("tags", []),
+                    },
+                    "status": "near_duplicate",
+                    "duplicate_of": existing.get("image_url"),
+                    "distance": distance,
+                    "upload_saved": False,
+                    "message": "This looks like a photo already in your gallery, so the new copy was not saved.",
+                    "is_safe": is_safe,
+                    "safety_issues": existing.get("safety_issues", [])
+                }
+
+            # 5. Preprocessed (oriented, downscaled, re-encoded) copy for the AI Agent - original disk pe hi rehta hai
+            try:
+                image_b64, image_mime = await asyncio.to_thread(model_base64, file_path)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Not a readable image: {e}")
+
+            # 6. Run the Vision Agent
+            initial_state = {
+                "user_id": user_id,
+                "image_base64": image_b64,
+                "image_mime": image_mime,
+                "image_url": image_url,
+                "phash": phash,
+                "raw_analysis_text": "",
+                "parsed_analysis": {},
+                "is_safe": True,
+                "safety_issues": [],
+                "memory_type": "unknown",
+                "status": "processing"
+            }
 
-        # 4. Run the Vision Agent
-        initial_state = {
-            "user_id": user_id,
-            "image_base64": image_b64,
-            "image_url": image_url,
-            "raw_analysis_text": "",
-            "parsed_analysis": {},
-            "is_safe": True,
-            "safety_issues": [],
-            "memory_type": "unknown",
-            "status": "processing"
-        }
+            result = await vision_agent.ainvoke(initial_state)
 
-        result = await vision_agent.ainvoke(initial_state)
+            # 7. Extract Analysis
+            analysis = result.get("parsed_analysis", {})
 
-        # 5. Extract Analysis
-        analysis = result.get("parsed_analysis", {})
+            # Agli baar same photo aaye to yahi analysis (API error wala nahi)
+            if result.get("status") != "error":
+                await asyncio.to_thread(content_store.set_analysis, digest, {
+                    "parsed_analysis": analysis,
+                    "is_safe": result.get("is_safe", True),
+                    "safety_issues": result.get("safety_issues", []),
+                    "memory_type": result.get("memory_type")
+                })
         
-        # 6. Save to RAG memory
-        # Note: luna_rag.memorize_image 'async' hai, isliye await sahi hai
-        if result.get("is_safe"):
-            await luna_rag.memorize_image(
-                user_id=user_id,
-                image_url=image_url,
-                description=analysis.get("scene", "Unknown image"),
-                analysis=analysis
-            )
+            # 8. Save to RAG memory
+            # Note: luna_rag.memorize_image 'async' hai, isliye await sahi hai
+            if result.get("is_safe"):
+                await luna_rag.memorize_image(
+                    user_id=user_id,
+                    image_url=image_url,
+                    description=analysis.get("scene", "Unknown image"),
+                    analysis=analysis,
+                    phash=phash
+                )
+                # Gallery thumbnails background mein (sirf jo photo gallery mein aayegi)
+                asyncio.create_task(asyncio.to_thread(warm_thumbnails, image_url))
 
-        return {
-            "analysis": analysis,
-            "status": result.get("status", "success"),
-            "is_safe": result.get("is_safe", True),
-            "safety_issues": result.get("safety_issues", [])
-        }
+            return {
+                "analysis": analysis,
+                "status": result.get("status", "success"),
+                "is_safe": result.get("is_safe", True),
+                "safety_issues": result.get("safety_issues", [])
+            }
+        finally:
+            # Request ka hold chhodo; memory ban gayi to uska reference file ko rakhega
+            await asyncio.to_thread(content_store.release, digest)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Vision Router Error: {e}")
         import traceback
@@ -2,10 +2,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
+import asyncio
 from pathlib import Path
 
 # Import all routers
-from app.routers import chat, vision, generation, history, gallery
+from app.routers import chat, vision, generation, history, gallery, thumbnails
+from app.core.archive import retention_loop
+from app.core.agent import get_speculation_stats
+from app.core.llm_gateway import llm_gateway
+from app.core.intent_classifier import intent_classifier
+from app.core.prompt_builder import prompt_builder
+from app.core.imaging import get_preprocess_stats
 
 # Create FastAPI app
 app = FastAPI(title="Luna AI Backend API", version="1.0.0")
@@ -33,6 +40,15 @@ app.include_router(vision.router, prefix="/api", tags=["Vision"])
 app.include_router(generation.router, prefix="/api", tags=["Generation"])
 app.include_router(history.router, prefix="/api", tags=["History"])
 app.include_router(gallery.router, prefix="/api", tags=["Gallery"])
+app.include_router(thumbnails.router, prefix="/api", tags=["Gallery"])
+
+# Background jobs (purani conversations ko archive mein bhejna)
+@app.on_event("startup")
+async def start_background_jobs():
+    asyncio.create_task(retention_loop())
+    if intent_classifier.model is None:
+        # Pehli baar: history se local intent model train kar lo
+        asyncio.create_task(intent_classifier.train_from_history())
 
 @app.get("/")
 def home():
@@ -42,6 +58,18 @@ def home():
 def health_check():
     return {"status": "healthy", "service": "Luna AI"}
 
+@app.get("/api/metrics")
+def metrics():
+    # Per-worker counters (har uvicorn worker ke apne)
+    return {
+        "speculation": get_speculation_stats(),
+        "llm_gateway": llm_gateway.stats,
+        "intent_classifier": intent_classifier.get_stats(),
+        "llm_cache": llm_gateway.cache.get_stats(),
+        "prompt": prompt_builder.get_stats(),
+        "image_preprocess": get_preprocess_stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     # 👇 FIX: Changed port to 8000 to match Frontend .env
@@ -78,7 +78,7 @@ function App() {
   const loadChatHistory = async () => {
     try {
       const response = await axios.get(`${API}/history/${userId}`);
-      const history = response.data;
+      const history = response.data.messages;
       
       const formattedMessages = history.map(msg => ({
         role: msg.role === "assistant" ? "luna" : "user",
@@ -154,17 +154,62 @@ function App() {
         setImagePreview(null);
       }
 
-      const chatResponse = await axios.post(`${API}/chat`, {
-        user_id: userId,
-        message: userMessage,
-        imageAnalysis: imageAnalysisData
+      // SSE stream: tokens aate hi bubble mein dikhao
+      const response = await fetch(`${API}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({
+          user_id: userId,
+          message: userMessage,
+          imageAnalysis: imageAnalysisData
+        })
       });
-
-      setMessages(prev => [...prev, {
-        role: "luna",
-        content: chatResponse.data.reply,
-        photo: chatResponse.data.photo_url
-      }]);
+      if (!response.ok || !response.body) throw new Error(`Stream failed: ${response.status}`);
+
+      let started = false;
+      const updateLunaMessage = (patch) => {
+        if (!started) {
+          started = true;
+          setIsLoading(false);
+          setMessages(prev => [...prev, { role: "luna", content: "", ...patch }]);
+          return;
+        }
+        setMessages(prev => {
+          const next = [...prev];
+          const last = next[next.length - 1];
+          next[next.length - 1] = { ...last, ...(typeof patch === "function" ? patch(last) : patch) };
+          return next;
+        });
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Har SSE event "\n\n" pe khatam hota hai
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const raw = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const event = (raw.match(/^event: (.*)$/m) || [])[1];
+          const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || "{}");
+
+          if (event === "token") {
+            if (started) updateLunaMessage(last => ({ content: last.content + data.text }));
+            else updateLunaMessage({ content: data.text });
+          } else if (event === "done") {
+            updateLunaMessage({ content: data.reply, photo: data.photo_url });
+            finished = true;
+          } else if (event === "error") {
+            throw new Error(data.detail);
+          }
+        }
+      }
 
     } catch (error) {
       console.error("Chat error:", error);
@@ -522,7 +567,9 @@ function App() {
                   <div key={idx} className="break-inside-avoid bg-slate-900 rounded-xl overflow-hidden border border-slate-800 hover:border-violet-500/50 transition group">
                     {img.image_url && (
                       <img 
-                        src={getFullImageUrl(img.image_url)} 
+                        src={getFullImageUrl(img.thumbnails?.["480"] || img.image_url)}
+                        srcSet={Object.entries(img.thumbnails || {}).map(([w, url]) => `${getFullImageUrl(url)} ${w}w`).join(", ") || undefined}
+                        sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
                         alt={img.description}
                         className="w-full object-cover group-hover:scale-105 transition-transform duration-500"
                         loading="lazy"
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# app.core modules build their singletons at import time; keep those files out of the repo
+_scratch = tempfile.mkdtemp(prefix="luna-tests-")
+os.environ.setdefault("LUNA_DB_BACKEND", "sqlite")
+os.environ.setdefault("LUNA_SQLITE_PATH", os.path.join(_scratch, "luna_memory.db"))
+os.environ.setdefault("LUNA_ARCHIVE_DIR", os.path.join(_scratch, "archive"))
+os.environ.setdefault("LUNA_GALLERY_STATS_PATH", os.path.join(_scratch, "gallery_stats.json"))
@@ -0,0 +1,22 @@
+import os
+import datetime
+
+from app.core.archive import ArchiveStore
+from app.core.serializers import get_serializer
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+def _msgs(user_id, start, n):
+    return [{"user_id": user_id, "content": f"{user_id}:{i}", "timestamp": T0 + datetime.timedelta(minutes=i)}
+            for i in range(start, start + n)]
+
+def test_similar_user_ids_do_not_share_a_directory(tmp_path):
+    store = ArchiveStore(root=str(tmp_path), serializer=get_serializer("json"))
+    for user_id in ("a b", "a/b", "a_b", "..", "."):
+        store.write_segment(user_id, _msgs(user_id, 0, 3))
+
+    for user_id in ("a b", "a/b", "a_b", "..", "."):
+        docs = store.find(user_id, limit=10, newest_first=False)
+        assert [d["content"] for d in docs] == [f"{user_id}:{i}" for i in range(3)]
+        assert os.path.dirname(store._user_dir(user_id)) == str(tmp_path)
+    assert len(os.listdir(tmp_path)) == 5
@@ -0,0 +1,74 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from app.routers import history
+from app.core.archive import ArchiveStore
+from app.core.database import LocalFileDB, AsyncCollection, WriteCoalescer
+from app.core.serializers import get_serializer
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+def _turn(i):
+    # User + Luna message same timestamp pe (ek turn)
+    ts = T0 + datetime.timedelta(minutes=i)
+    return [
+        {"user_id": "u1", "role": "user", "content": f"q{i}", "timestamp": ts},
+        {"user_id": "u1", "role": "assistant", "content": f"a{i}", "timestamp": ts},
+    ]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    db = LocalFileDB(str(tmp_path / "luna_memory.json"), compact_interval=3600, fsync_interval=0)
+    executor = ThreadPoolExecutor(max_workers=1)
+    archive = ArchiveStore(root=str(tmp_path / "archive"), serializer=get_serializer("json"))
+
+    # Turns 0-9 archive mein, 10-24 hot store mein
+    archive.write_segment("u1", [doc for i in range(10) for doc in _turn(i)])
+    db.conversations.insert_many([doc for i in range(10, 25) for doc in _turn(i)])
+
+    monkeypatch.setattr(history, "conversations_collection", AsyncCollection(db.conversations, executor, WriteCoalescer(db, executor)))
+    monkeypatch.setattr(history, "archive_store", archive)
+    yield
+    db.close()
+    executor.shutdown()
+
+def _page(**kwargs):
+    params = {"before": None, "after": None, "limit": 7, "newest_first": False, **kwargs}
+    return asyncio.run(history.get_conversation_history("u1", **params))
+
+def test_backward_paging_covers_hot_store_and_archive(store):
+    seen, before = [], None
+    while True:
+        page = _page(before=before)
+        assert len(page["messages"]) <= 7
+        seen = [m["content"] for m in page["messages"]] + seen
+        before = page["next_before"]
+        if before is None:
+            break
+
+    assert seen == [c for i in range(25) for c in (f"q{i}", f"a{i}")]
+
+def test_pages_never_split_a_turn(store):
+    page = _page(limit=7)
+    # 7 messages maangi, par turn beech se nahi katega -> 6
+    assert [m["content"] for m in page["messages"]] == ["q22", "a22", "q23", "a23", "q24", "a24"]
+    assert page["next_after"] is None
+
+def test_forward_paging_from_a_cursor(store):
+    start = (T0 + datetime.timedelta(minutes=8)).isoformat()
+    seen, after = [], start
+    while after:
+        page = _page(after=after)
+        seen += [m["content"] for m in page["messages"]]
+        after = page["next_after"]
+
+    assert seen == [c for i in range(9, 25) for c in (f"q{i}", f"a{i}")]
+
+def test_newest_first_reverses_the_page(store):
+    page = _page(limit=4, newest_first=True)
+    assert [m["content"] for m in page["messages"]] == ["a24", "q24", "a23", "q23"]
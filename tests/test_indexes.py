@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("google.genai")
+pytest.importorskip("dotenv")
+
+from app.core import vector_index as vector_module
+from app.core.database import LocalFileDB, AsyncCollection, WriteCoalescer
+from app.core.search_index import GallerySearchIndex
+from app.core.gallery_stats import GalleryStats
+from app.core.vector_index import VisualMemoryIndex, EMBED_DIM
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+@pytest.fixture
+def memories(tmp_path):
+    db = LocalFileDB(str(tmp_path / "luna_memory.json"), compact_interval=3600, fsync_interval=0)
+    executor = ThreadPoolExecutor(max_workers=1)
+    yield AsyncCollection(db.visual_memories, executor, WriteCoalescer(db, executor))
+    db.close()
+    executor.shutdown()
+
+def _memory(i, tags, **extra):
+    return {"user_id": "u1", "description": f"photo {i}", "tags": tags,
+            "timestamp": T0 + datetime.timedelta(days=i), **extra}
+
+def test_search_index_keeps_ids_and_loads_only_the_results(memories):
+    async def run():
+        await memories.insert_many([_memory(0, ["beach"]), _memory(1, ["cat"]), _memory(2, ["beach", "sunset"])])
+        index = GallerySearchIndex(collection=memories)
+        hits = await index.search("u1", "beach")
+
+        state = index._users["u1"]
+        assert not hasattr(state, "docs")
+        assert len(state.ids) == 3
+        return [doc["description"] for doc in hits]
+
+    # Barabar score pe naya pehle
+    assert asyncio.run(run()) == ["photo 2", "photo 0"]
+
+def test_add_updates_a_loaded_user_and_other_workers_trigger_a_rebuild(memories):
+    async def run():
+        await memories.insert_one(_memory(0, ["beach"]))
+        index = GallerySearchIndex(collection=memories)
+        assert len(await index.search("u1", "cat")) == 0
+
+        # Isi worker ka insert: incremental
+        doc = _memory(1, ["cat"])
+        await memories.insert_one(doc)
+        index.add("u1", doc)
+        built = index._users["u1"]
+        assert [d["description"] for d in await index.search("u1", "cat")] == ["photo 1"]
+        assert index._users["u1"] is built
+
+        # Dusre worker ka insert: count mismatch -> rebuild
+        await memories.insert_one(_memory(2, ["cat"]))
+        assert len(await index.search("u1", "cat")) == 2
+        assert index._users["u1"] is not built
+
+    asyncio.run(run())
+
+def test_vector_search_returns_loaded_docs_best_first(memories, monkeypatch):
+    def vector(axis):
+        v = [0.0] * EMBED_DIM
+        v[axis] = 1.0
+        return v
+
+    async def fake_embed(texts):
+        return [vector(0) for _ in texts]
+
+    monkeypatch.setattr(vector_module.llm_gateway, "embed", fake_embed)
+
+    async def run():
+        await memories.insert_many([
+            _memory(0, ["cat"], embedding=vector(1)),
+            _memory(1, ["beach"], embedding=vector(0)),
+        ])
+        index = VisualMemoryIndex(collection=memories)
+        results = await index.search("u1", "beach", k=2)
+        assert not hasattr(index._users["u1"], "docs")
+        return [(round(score, 3), doc["description"]) for score, doc in results]
+
+    assert asyncio.run(run()) == [(1.0, "photo 1"), (0.0, "photo 0")]
+
+def test_gallery_stats_load_the_snapshot_and_rebuild_on_mismatch(memories, tmp_path):
+    path = str(tmp_path / "gallery_stats.json")
+
+    async def run():
+        await memories.insert_many([_memory(0, ["Beach"], mood="happy"), _memory(1, ["beach", "cat"], mood="happy")])
+        first = GalleryStats(collection=memories, path=path)
+        await first.get("u1")
+        first.save()
+
+        # Naya worker: snapshot se, bina rescan
+        second = GalleryStats(collection=memories, path=path)
+        snapshot = second.user_map()["u1"]
+        assert await second.get("u1") is snapshot
+
+        doc = _memory(2, ["cat"], mood="calm")
+        await memories.insert_one(doc)
+        second.add("u1", doc)
+        stats = await second.get("u1")
+        assert stats is snapshot
+        assert (stats.total, dict(stats.tags), dict(stats.moods)) == (3, {"beach": 2, "cat": 2}, {"happy": 2, "calm": 1})
+
+        # Kisi aur worker ka insert -> rebuild
+        await memories.insert_one(_memory(3, []))
+        assert (await second.get("u1")).total == 4
+
+    asyncio.run(run())
@@ -0,0 +1,51 @@
+import pytest
+
+from app.core.intent_classifier import IntentClassifier, NaiveBayesIntent
+
+@pytest.fixture
+def classifier(tmp_path):
+    # Koi saved model nahi: sirf rules
+    return IntentClassifier(model_path=str(tmp_path / "intent_model.json"))
+
+@pytest.mark.parametrize("message, subject", [
+    ("send me a pic of the beach", "beach"),
+    ("Show your selfie of your new haircut!", "new haircut"),
+    ("goa beach ki photo dikhao", "goa beach"),
+    ("बिल्ली की फोटो दिखाओ", "बिल्ली"),
+    ("समुद्र की फ़ोटो भेजो", "समुद्र"),
+])
+def test_explicit_photo_requests_resolve_locally(classifier, message, subject):
+    result = classifier.classify(message)
+    assert result["intent"] == "photo"
+    assert result["photo_subject"] == subject
+
+@pytest.mark.parametrize("message", [
+    "फोटो दिखाओ",
+    "अपनी तस्वीर भेजो",
+    "एक सेल्फी भेजो ना",
+    "photo dikhao",
+    "show me how to cook pasta",
+    "can you show me the way to be happy",
+    "show me a cat",
+    "আমাকে একটা ছবি পাঠাও",   # Bengali: vocabulary mein nahi
+    "مجھے اپنی تصویر بھیجو",    # Urdu
+])
+def test_ambiguous_or_uncovered_messages_go_to_the_llm(classifier, message):
+    assert classifier.classify(message) is None
+
+@pytest.mark.parametrize("message", [
+    "how was your day?",
+    "aaj bahut thak gaya yaar",
+    "आज मौसम बहुत अच्छा है",
+    "main dikhau tumhe meri painting?",
+    "",
+])
+def test_plain_chat_resolves_locally(classifier, message):
+    assert classifier.classify(message)["intent"] == "chat"
+
+def test_model_is_not_trusted_on_scripts_it_cannot_tokenize(classifier):
+    examples = [(f"how was your day {i}", "chat") for i in range(60)] + [(f"send pic {i}", "photo") for i in range(6)]
+    classifier.model = NaiveBayesIntent().fit(examples)
+
+    # Koi token nahi -> sirf prior ("chat") bolta; LLM pe jaana chahiye
+    assert classifier.classify("আমাকে একটা ছবি পাঠাও") is None
@@ -0,0 +1,118 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import llm_cache as llm_cache_module
+from app.core.llm_cache import LLMCache
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache_module.time, "time", clock)
+    return clock
+
+def test_key_ignores_whitespace_and_case_but_not_model_or_temperature():
+    key = LLMCache.key("Caption  this\n   photo", "gemini-2.5-flash")
+    assert key == LLMCache.key("caption this photo", "gemini-2.5-flash")
+    assert key != LLMCache.key("caption this photo", "gemini-2.5-pro")
+    assert key != LLMCache.key("caption this photo", "gemini-2.5-flash", temperature=0.9)
+
+def test_entries_expire_after_ttl(clock):
+    cache = LLMCache(max_entries=10, ttl=60, path="")
+    cache.set("k", "v")
+    clock.now += 59
+    assert cache.get("k") == "v"
+
+    clock.now += 2
+    assert cache.get("k") is None
+    assert cache.stats["expired"] == 1
+    assert cache.get_stats()["entries"] == 0
+
+def test_per_entry_ttl_overrides_default(clock):
+    cache = LLMCache(max_entries=10, ttl=3600, path="")
+    cache.set("short", "v", ttl=5)
+    clock.now += 6
+    assert cache.get("short") is None
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = LLMCache(max_entries=2, ttl=60, path="")
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # "a" ab recent, "b" sabse purana
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats["evictions"] == 1
+
+def test_sqlite_tier_is_read_through_by_a_fresh_instance(tmp_path, clock):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(max_entries=10, ttl=60, path=path).set("k", "v")
+
+    # Dusra worker / restart: memory khaali, disk se milta hai
+    other = LLMCache(max_entries=10, ttl=60, path=path)
+    assert other.get("k") == "v"
+    assert other.stats["disk_hits"] == 1
+    # Ab memory mein bhi hai
+    assert other.get("k") == "v"
+    assert other.stats["hits"] == 1
+
+def test_expired_sqlite_entries_are_not_served(tmp_path, clock):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(max_entries=10, ttl=60, path=path).set("k", "v")
+    clock.now += 61
+
+    other = LLMCache(max_entries=10, ttl=60, path=path)
+    assert other.get("k") is None
+    assert other.stats["misses"] == 1
+
+def test_memory_only_cache_never_touches_disk(tmp_path, monkeypatch):
+    cache = LLMCache(max_entries=10, ttl=60, path="")
+    monkeypatch.setattr(cache, "_conn", lambda: pytest.fail("disk tier used without a path"))
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert cache.get("missing") is None
+
+class FakeModels:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        return SimpleNamespace(text=f" reply {self.calls} ")
+
+@pytest.fixture
+def gateway():
+    pytest.importorskip("google.genai")
+    pytest.importorskip("dotenv")
+    from app.core.llm_gateway import LLMGateway
+
+    gateway = LLMGateway(api_key="test")
+    gateway.cache = LLMCache(max_entries=10, ttl=60, path="")
+    gateway._client = SimpleNamespace(aio=SimpleNamespace(models=FakeModels()))
+    return gateway
+
+def test_uncached_prompts_bypass_the_cache(gateway):
+    async def run():
+        first = await gateway.generate("write a reply", temperature=0.9)
+        second = await gateway.generate("write a reply", temperature=0.9)
+        return first, second
+
+    assert asyncio.run(run()) == ("reply 1", "reply 2")
+    assert gateway.cache.get_stats()["entries"] == 0
+
+def test_cached_prompts_call_the_model_once(gateway):
+    async def run():
+        return [await gateway.generate("caption this", cache=True) for _ in range(3)]
+
+    assert asyncio.run(run()) == ["reply 1"] * 3
+    assert gateway.client.aio.models.calls == 1
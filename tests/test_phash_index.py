@@ -0,0 +1,92 @@
+import random
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("google.genai")
+pytest.importorskip("dotenv")
+
+from app.core.database import LocalFileDB, AsyncCollection, WriteCoalescer
+from app.core.imaging import hamming
+from app.core.phash_index import BKTree, PerceptualIndex, is_informative
+
+def _flip(phash, bits):
+    value = int(phash, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f"{value:016x}"
+
+@pytest.fixture
+def hashes():
+    rng = random.Random(7)
+    return [f"{rng.getrandbits(64):016x}" for _ in range(300)]
+
+def test_hamming_counts_differing_bits():
+    assert hamming("0000000000000000", "0000000000000000") == 0
+    assert hamming("0000000000000000", "ffffffffffffffff") == 64
+    assert hamming("f0f0f0f0f0f0f0f0", _flip("f0f0f0f0f0f0f0f0", [0, 9, 63])) == 3
+
+@pytest.mark.parametrize("radius", [0, 3, 6, 20])
+def test_bktree_search_matches_brute_force(hashes, radius):
+    tree = BKTree()
+    for i, value in enumerate(hashes):
+        tree.add(value, i)
+    assert tree.size == len(hashes)
+
+    query = _flip(hashes[42], [1, 2])
+    expected = sorted((hamming(query, value), i) for i, value in enumerate(hashes) if hamming(query, value) <= radius)
+    found = tree.search(query, radius)
+    assert sorted(found) == expected
+    # Closest first
+    assert [d for d, _ in found] == sorted(d for d, _ in found)
+
+def test_radius_is_inclusive(hashes):
+    tree = BKTree()
+    tree.add(hashes[0], "original")
+    assert tree.search(_flip(hashes[0], range(6)), 6) == [(6, "original")]
+    assert tree.search(_flip(hashes[0], range(7)), 6) == []
+
+def test_empty_tree_and_duplicate_hashes():
+    tree = BKTree()
+    assert tree.search("0123456789abcdef", 6) == []
+    tree.add("0123456789abcdef", "a")
+    tree.add("0123456789abcdef", "b")
+    assert sorted(tree.search("0123456789abcdef", 0)) == [(0, "a"), (0, "b")]
+
+@pytest.mark.parametrize("phash, expected", [
+    ("0000000000000000", False),   # Blank / dark
+    ("0000000000000003", False),
+    ("ffffffffffffffff", False),   # Smooth gradient
+    ("00000000000000ff", True),
+    ("a5c3f00f1e2d3c4b", True),
+])
+def test_flat_image_hashes_are_not_informative(phash, expected):
+    assert is_informative(phash) is expected
+
+def test_flat_images_are_never_near_duplicates(tmp_path):
+    db = LocalFileDB(str(tmp_path / "luna_memory.json"), compact_interval=3600, fsync_interval=0)
+    executor = ThreadPoolExecutor(max_workers=1)
+    memories = AsyncCollection(db.visual_memories, executor, WriteCoalescer(db, executor))
+    index = PerceptualIndex(collection=memories)
+
+    async def run():
+        now = datetime.datetime(2026, 1, 1)
+        await memories.insert_many([
+            {"user_id": "u1", "image_url": "dark.jpg", "phash": "0000000000000001", "timestamp": now},
+            {"user_id": "u1", "image_url": "cat.jpg", "phash": "a5c3f00f1e2d3c4b", "timestamp": now},
+        ])
+        blank = await index.find_near_duplicate("u1", "0000000000000000")
+        near = await index.find_near_duplicate("u1", _flip("a5c3f00f1e2d3c4b", [5]))
+        return blank, near
+
+    try:
+        blank, near = asyncio.run(run())
+    finally:
+        db.close()
+        executor.shutdown()
+
+    assert blank is None
+    assert near[0] == 1 and near[1]["image_url"] == "cat.jpg"
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from app.core.prompt_builder import PromptBuilder, estimate_tokens, _truncate, DEFAULT_USER_NAME
+
+TEMPLATE = "You are {ai_name}, talking to {user_name}."
+
+@pytest.fixture
+def builder():
+    return PromptBuilder(template=TEMPLATE, budget=200)
+
+def _history(n):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"message number {i} " * 4} for i in range(n)]
+
+def test_devanagari_and_hinglish_cost_more_per_character_than_english():
+    english = estimate_tokens("what did you do today")
+    hinglish = estimate_tokens("aaj tumne kya kiya yaar")
+    hindi = estimate_tokens("आज तुमने क्या किया यार")
+    assert english < hinglish < hindi
+
+@pytest.mark.parametrize("text", [
+    "we went to the beach and it was lovely " * 40,
+    "kal hum beach gaye the aur bahut maza aaya " * 40,
+    "कल हम समुद्र के किनारे गए थे और बहुत मज़ा आया " * 40,
+    "party 🎉🎉 thi yaar 😂 " * 40,
+])
+@pytest.mark.parametrize("cap", [5, 40, 150])
+def test_truncate_stays_within_the_token_cap(text, cap):
+    trimmed = _truncate(text, cap)
+    assert trimmed != text
+    assert trimmed.endswith(" …")
+    assert estimate_tokens(trimmed) <= cap
+
+def test_build_fits_the_budget_and_drops_oldest_history_then_memories():
+    builder = PromptBuilder(template=TEMPLATE, budget=600)
+    history = _history(20)
+    memories = [f"photo {i} at the beach with friends" for i in range(10)]
+    messages, breakdown = builder.build("u1", "hi", history=history, summary="s " * 1500, memories=memories)
+
+    assert breakdown["total"] <= builder.budget
+    # Summary kati, history naye se purane tak bhari, memories bachi hui jagah mein
+    assert "…" in messages[0].content
+    kept = breakdown["history_kept"]
+    assert 0 < kept < len(history)
+    assert [m.content for m in messages[1:-1]] == [d["content"] for d in history[-kept:]]
+    assert 0 < breakdown["memories_dropped"] < len(memories)
+    assert messages[-1].content == "hi"
+
+def test_build_keeps_everything_under_budget(builder):
+    messages, breakdown = builder.build("u1", "hi", history=_history(2), summary="short", memories=["one photo"])
+    assert breakdown["history_dropped"] == 0
+    assert breakdown["memories_dropped"] == 0
+    assert "short" in messages[0].content and "one photo" in messages[0].content
+
+def test_persona_cache_is_keyed_by_resolved_name(builder):
+    assert builder.persona(None) is builder.persona(DEFAULT_USER_NAME)
+    assert builder.persona("Asha")[0] == "You are Luna, talking to Asha."
+
+    # Alag users, same naam -> ek hi entry
+    builder.build("u1", "hi", user_name="Asha")
+    builder.build("u2", "hi", user_name="Asha")
+    builder.build("u3", "hi")
+    assert builder.get_stats()["personas_cached"] == 2
@@ -0,0 +1,71 @@
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("google.genai")
+pytest.importorskip("dotenv")
+pytest.importorskip("langchain_core")
+
+from app.core import archive, summarizer
+from app.core.archive import ArchiveStore
+from app.core.database import LocalFileDB, AsyncCollection, WriteCoalescer
+from app.core.serializers import get_serializer
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+def _turn(i):
+    ts = T0 + datetime.timedelta(minutes=i)
+    return [
+        {"user_id": "u1", "role": "user", "content": f"q{i}", "timestamp": ts},
+        {"user_id": "u1", "role": "assistant", "content": f"a{i}", "timestamp": ts},
+    ]
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    db = LocalFileDB(str(tmp_path / "luna_memory.json"), compact_interval=3600, fsync_interval=0)
+    executor = ThreadPoolExecutor(max_workers=1)
+    writer = WriteCoalescer(db, executor)
+    conversations = AsyncCollection(db.conversations, executor, writer)
+    summaries = AsyncCollection(db.conversation_summaries, executor, writer)
+    cold = ArchiveStore(root=str(tmp_path / "archive"), serializer=get_serializer("json"))
+
+    for module in (archive, summarizer):
+        monkeypatch.setattr(module, "conversations_collection", conversations)
+        monkeypatch.setattr(module, "summaries_collection", summaries)
+    monkeypatch.setattr(archive, "archive_store", cold)
+    yield db, cold
+    db.close()
+    executor.shutdown()
+
+def test_retention_never_archives_turns_the_summary_has_not_folded(stores):
+    db, cold = stores
+    db.conversations.insert_many([doc for i in range(30) for doc in _turn(i)])
+    # Summary sirf turn 10 tak pahunchi hai
+    db.conversation_summaries.insert_one({"user_id": "u1", "summary": "turns 0-10",
+                                          "covered_until": T0 + datetime.timedelta(minutes=10),
+                                          "timestamp": T0 + datetime.timedelta(hours=1)})
+
+    async def run():
+        moved = await archive.apply_retention("u1", keep_last=10, max_age_days=0, min_batch=1)
+        summary, recent = await summarizer.load_context("u1", turns=6, token_budget=10_000)
+        return moved, summary, recent
+
+    moved, summary, recent = asyncio.run(run())
+
+    assert moved == 22  # Turns 0-10, jo summary mein aa chuke
+    assert [d["content"] for d in cold.find("u1", limit=100, newest_first=False)][-2:] == ["q10", "a10"]
+    # Turns 11-29 abhi bhi hot store mein: agli summary inhe fold karegi
+    assert db.conversations.count_documents({"user_id": "u1"}) == 38
+    assert summary == "turns 0-10"
+    assert [d["content"] for d in recent] == [c for i in range(24, 30) for c in (f"q{i}", f"a{i}")]
+
+def test_retention_waits_for_a_first_summary(stores):
+    db, cold = stores
+    db.conversations.insert_many([doc for i in range(30) for doc in _turn(i)])
+
+    moved = asyncio.run(archive.apply_retention("u1", keep_last=10, max_age_days=0, min_batch=1))
+
+    assert moved == 0
+    assert cold.find("u1", limit=100) == []
@@ -0,0 +1,84 @@
+import os
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PIL")
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core import thumbnails
+from app.routers.thumbnails import get_thumbnail
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    # UPLOAD_DIR / THUMB_DIR relative hain: tmp dir se chalao
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("uploads/ab/cd")
+    Image.new("RGB", (800, 600), (200, 40, 40)).save("uploads/ab/cd/photo.jpg")
+    (tmp_path / "secret.txt").write_text("outside uploads")
+    return tmp_path
+
+def _get(path, width=160, if_none_match=None):
+    headers = {"if-none-match": if_none_match} if if_none_match else {}
+    return asyncio.run(get_thumbnail(width, path, SimpleNamespace(headers=headers)))
+
+def _status(path, width=160):
+    with pytest.raises(HTTPException) as error:
+        _get(path, width)
+    return error.value.status_code
+
+@pytest.mark.parametrize("path", [
+    "../secret.txt",
+    "ab/../../secret.txt",
+    "/etc/passwd",
+    "ab//cd/photo.jpg",
+    ".thumbs/160/ab/cd/photo.webp",
+    ".tmp/upload",
+    "",
+])
+def test_paths_outside_uploads_or_internal_are_rejected(uploads, path):
+    assert thumbnails.source_path(path) is None
+    assert _status(path) == 404
+
+def test_symlinks_out_of_uploads_are_rejected(uploads):
+    os.symlink(uploads / "secret.txt", uploads / "uploads" / "link.jpg")
+    os.symlink(uploads, uploads / "uploads" / "escape")
+    assert thumbnails.source_path("link.jpg") is None
+    assert thumbnails.source_path("escape/secret.txt") is None
+    assert _status("link.jpg") == 404
+
+def test_unsupported_width_is_a_bad_request(uploads):
+    assert _status("ab/cd/photo.jpg", width=123) == 400
+
+def test_thumbnail_is_served_with_immutable_cache_and_etag(uploads):
+    response = _get("ab/cd/photo.jpg")
+    assert response.status_code == 200
+    assert response.media_type == "image/webp"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    with Image.open(response.path) as img:
+        assert img.width == 160
+
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    # Same version dobara: wahi ETag
+    assert _get("ab/cd/photo.jpg").headers["etag"] == etag
+
+def test_if_none_match_returns_304(uploads):
+    etag = _get("ab/cd/photo.jpg").headers["etag"]
+
+    cached = _get("ab/cd/photo.jpg", if_none_match=f'"stale", {etag}')
+    assert cached.status_code == 304
+    assert cached.body == b""
+    assert cached.headers["etag"] == etag
+    assert "immutable" in cached.headers["cache-control"]
+
+    assert _get("ab/cd/photo.jpg", if_none_match='"stale"').status_code == 200
+
+def test_each_width_has_its_own_etag(uploads):
+    small = _get("ab/cd/photo.jpg", width=160).headers["etag"]
+    large = _get("ab/cd/photo.jpg", width=480).headers["etag"]
+    assert small != large
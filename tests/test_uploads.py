@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+pytest.importorskip("xxhash")
+
+from app.core.uploads import ContentStore
+
+def _tmp_file(root, data):
+    tmp_dir = os.path.join(root, ".tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    path = os.path.join(tmp_dir, os.urandom(4).hex())
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+@pytest.fixture
+def store(tmp_path):
+    return ContentStore(root=str(tmp_path / "uploads"), db_path=str(tmp_path / "luna_uploads.db"))
+
+def test_store_db_lives_outside_uploads(store, tmp_path):
+    store.put(_tmp_file(store.root, b"img"), "d1", 3, ".jpg")
+    assert os.path.exists(tmp_path / "luna_uploads.db")
+    assert not any(name.endswith(".db") for name in os.listdir(store.root))
+
+def test_upload_without_memory_is_removed_after_the_request(store):
+    path, is_duplicate = store.put(_tmp_file(store.root, b"img"), "d1", 3, ".jpg")
+    assert not is_duplicate
+    store.release("d1")
+    assert not os.path.exists(path)
+
+def test_duplicate_uploads_do_not_pin_the_file(store):
+    path, _ = store.put(_tmp_file(store.root, b"img"), "d1", 3, ".jpg")
+    store.retain(path)  # Memory ban gayi
+    store.release("d1")
+
+    # Wahi photo 3 baar aur, koi nayi memory nahi
+    for _ in range(3):
+        assert store.put(_tmp_file(store.root, b"img"), "d1", 3, ".jpg") == (path, True)
+        store.release("d1")
+
+    # Sirf memory ka reference bacha hai
+    store.release("d1")
+    assert not os.path.exists(path)
+
+def test_retain_ignores_paths_outside_the_store(store):
+    store.retain("uploads/legacy.jpg")